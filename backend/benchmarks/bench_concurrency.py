@@ -0,0 +1,196 @@
+"""
+Concurrency benchmark for the database-backed read endpoints.
+
+Seeds a temporary database through the migrations, starts the API with uvicorn
+in a subprocess and drives it with an increasing number of in-flight requests
+(/explore pages, /explore/{keyword} search and /project/my-ideas). For each
+level it prints throughput and latency, plus the latency of a probe request
+that never touches the database (/metrics/project-index): if database work
+blocked the event loop, the probe would queue behind every in-flight request.
+Throughput itself stops growing once the worker processes use all CPU cores
+(SQLite queries run in-process); --workers starts more uvicorn workers.
+
+    cd backend && python -m benchmarks.bench_concurrency --projects 20000 --levels 1,2,4,8,16,32,64
+
+--url points the API at another database (e.g. PostgreSQL, seeded by the
+benchmark when its project table is empty).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = ("şişe", "kavanoz", "palet", "tişört", "lamba", "saksı", "sehpa", "çanta", "bottle", "jar", "shelf", "basket")
+MATERIALS = ("makas", "boya", "ip", "yapıştırıcı", "karton", "bant", "fırça", "tel")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64", help="in-flight requests per step")
+    parser.add_argument("--requests", type=int, default=600, help="requests per level")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--url", help="SQLAlchemy URL of the database to use (default: temporary SQLite)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def configure_environment(args, work_dir):
+    # utils modülleri import edilmeden önce ayarlanmalı, sunucu da aynı ortamı kullanır
+    os.environ["SQLALCHAMY_DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+    os.environ.setdefault("JWT_SECRET_KEY", "bench")
+    os.environ.setdefault("JWT_ALGORITHM", "HS256")
+    os.environ["IMAGE_INDEX_PATH"] = os.path.join(work_dir, "image_index.db")
+    os.environ["JOB_QUEUE_PATH"] = os.path.join(work_dir, "jobs.db")
+    os.environ["IDEA_CACHE_PATH"] = ""
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ["LOG_LEVEL"] = "WARNING"
+
+
+def seed(args):
+    from utils.database import SessionLocal, run_migrations
+    from utils.models import Project, User
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        if db.query(Project.id).first() is not None:
+            return
+        db.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, args.users + 1)
+        ])
+        rng = random.Random(args.seed)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = []
+        for i in range(args.projects):
+            created_at = start + timedelta(minutes=i)
+            rows.append({
+                "user_id": rng.randint(1, args.users),
+                "title": " ".join(rng.sample(WORDS, 2)),
+                "description": " ".join(rng.choices(WORDS, k=8)),
+                "materials": rng.sample(MATERIALS, 3),
+                "roadmap": ["step"],
+                "image": "static/uploads/bench.jpg",
+                "created_at": created_at,
+                "updated_at": created_at,
+                "is_public": rng.random() < 0.5,
+            })
+        db.execute(Project.__table__.insert(), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_server(args):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(os.environ)
+    )
+
+
+async def wait_until_ready(client, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/explore", params={"limit": 1})).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+def request_mix(args):
+    from utils.auth import create_access_token
+
+    token = create_access_token(username="user1", user_id=1, expire_time=timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(args.seed)
+    while True:
+        kind = rng.random()
+        if kind < 0.5:
+            yield "/explore", {"limit": 20}, None
+        elif kind < 0.8:
+            yield f"/explore/{rng.choice(WORDS)}", {"limit": 20}, None
+        else:
+            yield "/project/my-ideas", {}, headers
+
+
+async def probe(client, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/metrics/project-index")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.02)
+
+
+async def run_level(client, mix, concurrency, total):
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            path, params, headers = next(mix)
+            started = time.perf_counter()
+            response = await client.get(path, params=params, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    probe_latencies, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(client, stop, probe_latencies))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "probe_p50": statistics.median(probe_latencies) if probe_latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+async def run(args):
+    import httpx
+
+    levels = [int(level) for level in args.levels.split(",")]
+    mix = request_mix(args)
+    limits = httpx.Limits(max_connections=max(levels) + 1, max_keepalive_connections=max(levels) + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+        await wait_until_ready(client)
+        await run_level(client, mix, 4, 100) # ısınma
+        print(f"{'in-flight':>9}  {'req/s':>8}  {'p50 ms':>8}  {'p99 ms':>8}  {'probe p50 ms':>12}  errors")
+        for level in levels:
+            result = await run_level(client, mix, level, args.requests)
+            print(f"{level:>9}  {result['rps']:>8.1f}  {result['p50']:>8.2f}  {result['p99']:>8.2f}  "
+                  f"{result['probe_p50']:>12.2f}  {result['errors']}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(args, work_dir)
+        sys.path.insert(0, BACKEND_DIR)
+        seed(args)
+        server = start_server(args)
+        try:
+            asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.wait()
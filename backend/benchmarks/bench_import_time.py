@@ -0,0 +1,109 @@
+"""
+Import-time benchmark for the API process.
+
+Imports main in fresh interpreters and reports the median import time and
+peak RSS. Fails when the median exceeds the budget or when one of the heavy
+SDKs that must stay lazy (LAZY_MODULES) is loaded at import time.
+
+    cd backend && python -m benchmarks.bench_import_time [--runs 5] [--budget 1.5] [--top 15]
+
+--top prints the slowest imports from `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ilk kullanımda import edilmesi gereken modüller
+LAZY_MODULES = (
+    "google.genai",
+    "google.generativeai",
+    "langchain_google_genai",
+    "langchain_core",
+    "bs4",
+    "markdown",
+)
+
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def child_environment(work_dir):
+    env = dict(os.environ)
+    env.setdefault("SQLALCHAMY_DATABASE_URL", f"sqlite:///{os.path.join(work_dir, 'bench.db')}")
+    env.setdefault("JWT_SECRET_KEY", "bench")
+    env.setdefault("JWT_ALGORITHM", "HS256")
+    env.setdefault("JOB_QUEUE_PATH", os.path.join(work_dir, "jobs.db"))
+    return env
+
+
+def measure(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET", "1.5")), help="seconds")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        env = child_environment(work_dir)
+        results = [measure(env) for _ in range(args.runs)]
+        top = slowest_imports(env, args.top) if args.top else []
+
+    seconds = [result["seconds"] for result in results]
+    median = statistics.median(seconds)
+    print(f"import main: median {median:.3f}s  min {min(seconds):.3f}s  max {max(seconds):.3f}s  "
+          f"peak RSS {statistics.median(r['max_rss_mb'] for r in results):.1f} MB  (budget {args.budget:.3f}s)")
+
+    if top:
+        print(f"\n{'cumulative ms':>14}  module")
+        for cumulative_us, name in top:
+            print(f"{cumulative_us / 1000:>14.1f}  {name}")
+
+    loaded = sorted({
+        module for module in results[0]["modules"]
+        for lazy in LAZY_MODULES if module == lazy or module.startswith(lazy + ".")
+    })
+    failed = False
+    if loaded:
+        print(f"\nFAIL: loaded at import time but must stay lazy: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"\nFAIL: import time {median:.3f}s is over the {args.budget:.3f}s budget")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,199 @@
+"""
+Query plan and latency benchmark for the project listing queries.
+
+Seeds a project table (one million rows by default), then runs the my-ideas
+query (one user's projects, newest first) and the explore query (public
+projects, newest first) twice: without the listing indexes and with
+ix_project_user_created / ix_project_public_created. For each run it prints
+the query plan and p50/p99 latency. Full-text search (/explore/{keyword}) is
+timed last with a few keywords of different selectivity.
+
+    cd backend && python -m benchmarks.bench_project_queries --rows 1000000 --users 20000
+
+--db keeps the seeded SQLite file between runs (seeding is skipped when the
+table already has rows); --url points at another database, e.g. PostgreSQL,
+where EXPLAIN ANALYZE is printed instead of EXPLAIN QUERY PLAN.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LISTING_INDEXES = ("ix_project_user_created", "ix_project_public_created")
+SEED_BATCH = 20000
+
+ITEMS = ("şişe", "kavanoz", "palet", "tişört", "dergi", "lastik", "teneke", "karton", "bottle", "jar", "pallet", "tire")
+PROJECTS = ("lamba", "saksı", "sehpa", "çanta", "sepet", "raf", "mumluk", "organizer", "planter", "lamp", "shelf", "basket")
+WORDS = ("eski", "renkli", "dekoratif", "kolay", "hızlı", "boyalı", "doğal", "old", "painted", "simple", "rustic", "modern")
+SEARCH_KEYWORDS = ("şişe lamba", "rustic", "jar", "kavanoz mumluk boyalı")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--public-share", type=float, default=0.3)
+    parser.add_argument("--limit", type=int, default=50, help="page size of the listing queries")
+    parser.add_argument("--queries", type=int, default=200, help="timed queries per case")
+    parser.add_argument("--db", help="SQLite file to seed or reuse (default: temporary)")
+    parser.add_argument("--url", help="SQLAlchemy URL, overrides --db")
+    parser.add_argument("--keyword", action="append", help="search keyword to time, repeatable (default: a fixed set)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def seed(engine, args):
+    from utils.models import Project, User
+
+    with engine.begin() as conn:
+        if conn.execute(Project.__table__.select().limit(1)).first() is not None:
+            print("project table already seeded, reusing it")
+            return
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, args.users + 1)
+        ])
+
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    span_seconds = int(timedelta(days=730).total_seconds())
+    started = time.perf_counter()
+    for offset in range(0, args.rows, SEED_BATCH):
+        rows = []
+        for _ in range(min(SEED_BATCH, args.rows - offset)):
+            created_at = start + timedelta(seconds=rng.randrange(span_seconds))
+            item, project = rng.choice(ITEMS), rng.choice(PROJECTS)
+            rows.append({
+                "user_id": rng.randint(1, args.users),
+                "title": f"{item} {project}",
+                "description": " ".join(rng.choices(WORDS, k=6) + [item, project]),
+                "materials": [item, rng.choice(ITEMS)],
+                "roadmap": ["cut", "paint"],
+                "image": "static/uploads/bench.jpg",
+                "created_at": created_at,
+                "updated_at": created_at,
+                "is_public": rng.random() < args.public_share,
+            })
+        with engine.begin() as conn:
+            conn.execute(Project.__table__.insert(), rows)
+    print(f"seeded {args.rows} projects for {args.users} users in {time.perf_counter() - started:.1f}s")
+
+
+def set_listing_indexes(engine, enabled):
+    from sqlalchemy import text
+    from utils.models import Project
+
+    indexes = [index for index in Project.__table__.indexes if index.name in LISTING_INDEXES]
+    with engine.begin() as conn:
+        for index in indexes:
+            if enabled:
+                index.create(conn, checkfirst=True)
+            else:
+                index.drop(conn, checkfirst=True)
+        # planner istatistikleri güncellenir
+        conn.execute(text("ANALYZE"))
+
+
+def listing_queries(args):
+    from sqlalchemy import bindparam, select
+    from utils.models import Project
+
+    my_ideas = (
+        select(Project.__table__)
+        .where(Project.user_id == bindparam("user_id", 1))
+        .order_by(Project.created_at.desc())
+        .limit(args.limit)
+    )
+    explore = (
+        select(Project.__table__)
+        .where(Project.is_public == True)
+        .order_by(Project.created_at.desc())
+        .limit(args.limit)
+    )
+    return {"my-ideas": my_ideas, "explore": explore}
+
+
+def query_plan(engine, query):
+    from sqlalchemy import text
+
+    sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN ANALYZE "
+    with engine.connect() as conn:
+        rows = conn.execute(text(explain + sql)).fetchall()
+    if engine.dialect.name == "sqlite":
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def latencies(engine, name, query, args):
+    rng = random.Random(args.seed)
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(args.queries):
+            params = {"user_id": rng.randint(1, args.users)} if name == "my-ideas" else {}
+            started = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+async def search_latencies(url, keyword, args):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from utils.database import async_database_url
+    from utils.fulltext import search_public_projects
+
+    engine = create_async_engine(async_database_url(url))
+    timings = []
+    async with AsyncSession(engine) as db:
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            hits = await search_public_projects(db, keyword, args.limit)
+            timings.append((time.perf_counter() - started) * 1000)
+    await engine.dispose()
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1], len(hits)
+
+
+def main(args, work_dir):
+    url = args.url or f"sqlite:///{os.path.abspath(args.db or os.path.join(work_dir, 'bench_projects.db'))}"
+    # utils.database import edilmeden önce ayarlanmalı
+    os.environ["SQLALCHAMY_DATABASE_URL"] = url
+    sys.path.insert(0, BACKEND_DIR)
+
+    from sqlalchemy import create_engine
+    from utils.database import run_migrations
+
+    # tam metin arama tabloları ve trigger'lar da migration'larla oluşur
+    run_migrations()
+    engine = create_engine(url)
+    # seed sırasında index bakımı yapılmaz
+    set_listing_indexes(engine, enabled=False)
+    seed(engine, args)
+
+    queries = listing_queries(args)
+    for enabled in (False, True):
+        set_listing_indexes(engine, enabled)
+        print(f"\n=== {'with' if enabled else 'without'} listing indexes ===")
+        for name, query in queries.items():
+            p50, p99 = latencies(engine, name, query, args)
+            print(f"\n{name}: p50 {p50:.2f} ms  p99 {p99:.2f} ms  ({args.queries} queries, limit {args.limit})")
+            for line in query_plan(engine, query):
+                print(f"    {line}")
+
+    print("\n=== full-text search ===")
+    for keyword in args.keyword or SEARCH_KEYWORDS:
+        p50, p99, returned = asyncio.run(search_latencies(url, keyword, args))
+        print(f"{keyword!r}: p50 {p50:.2f} ms  p99 {p99:.2f} ms  ({returned} returned)")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        main(args, work_dir)
@@ -0,0 +1,125 @@
+"""
+Rows/sec of the project list response path (/project/my-ideas), before and after.
+
+Seeds one user with --rows projects, then loads them with the my-ideas query
+and renders the response body repeatedly in two ways:
+
+- before: stdlib json for the JSON columns, ProjectSchema.model_validate +
+  model_dump per row with the old image path munging, stdlib JSONResponse
+- after: orjson for the JSON columns, one PROJECT_LIST TypeAdapter call,
+  ORJSONResponse
+
+Serialization alone (rows already loaded) is timed separately from the full
+query + render path.
+
+    cd backend && python -m benchmarks.bench_serialization --rows 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="projects of the user")
+    parser.add_argument("--repeat", type=int, default=50, help="renders per case")
+    return parser.parse_args()
+
+
+def legacy_dump(schema, project):
+    # eski ProjectSchema.model_dump: her satırda görsel yolları parçalanırdı
+    data = schema.model_validate(project).model_dump(mode="json")
+    for field in ("image", "recycled_image"):
+        value = getattr(project, field)
+        if value:
+            parts = value.replace("\\", "/").split("/")
+            data[field] = "/".join(parts[parts.index("uploads"):]) if "uploads" in parts else value
+    return data
+
+
+def seed(engine, rows):
+    from utils.models import Project, User
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "username": "user1", "email": "user1@example.com"}])
+        conn.execute(Project.__table__.insert(), [
+            {
+                "user_id": 1,
+                "title": f"Cam şişeden masa lambası {i}",
+                "description": "Eski cam şişeleri temizleyip içine LED ışık yerleştirerek dekoratif bir lamba yapın.",
+                "materials": ["cam şişe", "led ışık", "sıcak silikon", "zımpara"],
+                "roadmap": [f"{step}. adım: şişeyi hazırlayın ve ışığı yerleştirin" for step in range(1, 7)],
+                "image": f"uploads/{i:032x}.jpg",
+                "recycled_image": f"uploads/{i:032x}-done.jpg" if i % 2 else None,
+                "created_at": start + timedelta(minutes=i),
+                "updated_at": start + timedelta(minutes=i),
+                "is_public": i % 3 == 0,
+            }
+            for i in range(rows)
+        ])
+
+
+def rate(rows, repeat, render):
+    render()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    return rows * repeat / (time.perf_counter() - started)
+
+
+def main(args, work_dir):
+    url = f"sqlite:///{os.path.join(work_dir, 'bench_serialization.db')}"
+    # utils.database import edilmeden önce ayarlanmalı
+    os.environ["SQLALCHAMY_DATABASE_URL"] = url
+    sys.path.insert(0, BACKEND_DIR)
+
+    import orjson
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+    from starlette.responses import JSONResponse
+    from utils.database import run_migrations
+    from utils.models import Project, ProjectSchema, dump_projects
+    from utils.responses import ORJSONResponse
+
+    run_migrations()
+    before_engine = create_engine(url)
+    after_engine = create_engine(url, json_deserializer=orjson.loads)
+    seed(before_engine, args.rows)
+    query = select(Project).filter(Project.user_id == 1).order_by(Project.created_at.desc())
+
+    def load(engine):
+        with Session(engine) as db:
+            return db.execute(query).scalars().all()
+
+    def render_before(projects):
+        return JSONResponse(content=[legacy_dump(ProjectSchema, project) for project in projects]).body
+
+    def render_after(projects):
+        return ORJSONResponse(content=dump_projects(projects)).body
+
+    loaded = load(before_engine)
+    assert orjson.loads(render_before(loaded)) == orjson.loads(render_after(loaded)), "response bodies differ"
+
+    cases = (
+        ("serialize only", lambda: render_before(loaded), lambda: render_after(loaded)),
+        ("query + serialize", lambda: render_before(load(before_engine)), lambda: render_after(load(after_engine))),
+    )
+    print(f"{args.rows} projects, {args.repeat} renders per case")
+    print(f"{'case':<18}  {'before rows/s':>14}  {'after rows/s':>13}  speedup")
+    for name, before, after in cases:
+        before_rate, after_rate = rate(args.rows, args.repeat, before), rate(args.rows, args.repeat, after)
+        print(f"{name:<18}  {before_rate:>14,.0f}  {after_rate:>13,.0f}  {after_rate / before_rate:.2f}x")
+    before_engine.dispose()
+    after_engine.dispose()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        main(args, work_dir)
@@ -0,0 +1,152 @@
+"""
+Offline load test of the idea and roadmap generation pipeline.
+
+Runs generate_ideas / stream_ideas / GeminiService.generate_roadmap against the
+fake LLM provider (utils.llm_provider.FakeProvider), so the cache, near-duplicate
+index, single-flight, image preprocessing and GEMINI_GUARD are all exercised
+without network access or quota.
+
+    cd backend && python -m benchmarks.load_test --requests 500 --concurrency 64 \\
+        --latency 2.0 --sigma 0.6 --error-rate 0.05 --repeat 0.2
+
+--repeat is the share of requests that reuse an earlier image (cache and
+single-flight hits); the rest are unique random images.
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("ideas", "stream", "roadmap"), default="ideas")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--repeat", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=1.0, help="median fake LLM latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal sigma of the fake latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def configure_environment(args, work_dir):
+    # utils modülleri import edilmeden önce ayarlanmalı, load_dotenv mevcut değerleri ezmez
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MEDIAN"] = str(args.latency)
+    os.environ["FAKE_LLM_LATENCY_SIGMA"] = str(args.sigma)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    os.environ["IMAGE_INDEX_PATH"] = os.path.join(work_dir, "image_index.db")
+    os.environ["IDEA_CACHE_PATH"] = ""
+
+
+def make_images(args, work_dir):
+    """Random noise JPEGs; repeated requests point at an earlier file."""
+    from PIL import Image
+
+    rng = random.Random(args.seed)
+    paths = []
+    for i in range(args.requests):
+        if paths and rng.random() < args.repeat:
+            paths.append(rng.choice(paths))
+            continue
+        image = Image.frombytes("RGB", (320, 240), rng.randbytes(320 * 240 * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=80)
+        path = os.path.join(work_dir, f"image_{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(buffer.getvalue())
+        paths.append(path)
+    return paths
+
+
+async def run(args, paths):
+    from utils.geminiConnection import FALLBACK_IDEAS, generate_ideas, stream_ideas
+    from utils.gemini_service import GeminiService
+    from utils.image_index import IMAGE_INDEX
+    from utils.resilience import GEMINI_GUARD
+    from utils.singleflight import SINGLE_FLIGHTS
+    from utils.image_preprocess import IMAGE_PREPROCESSOR
+
+    for path in sorted(set(paths)):
+        with open(path, "rb") as f:
+            IMAGE_INDEX.add(path, f.read())
+
+    service = GeminiService()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    first_results = []
+    outcomes = {"ok": 0, "fallback": 0, "empty": 0, "error": 0}
+
+    async def one(path):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if args.mode == "ideas":
+                    result = await generate_ideas(path)
+                elif args.mode == "stream":
+                    result = []
+                    async for idea in stream_ideas(path):
+                        if not result:
+                            first_results.append(time.perf_counter() - started)
+                        result.append(idea)
+                else:
+                    with open(path, "rb") as f:
+                        result = await service.generate_roadmap(f.read(), "Kalemlik", "Bardaktan kalemlik")
+            except Exception as e:
+                print(f"[ERROR] {type(e).__name__}: {e}")
+                outcomes["error"] += 1
+                return
+            finally:
+                latencies.append(time.perf_counter() - started)
+            if not result:
+                outcomes["empty"] += 1
+            elif result is FALLBACK_IDEAS:
+                outcomes["fallback"] += 1
+            else:
+                outcomes["ok"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in paths))
+    elapsed = time.perf_counter() - started
+    IMAGE_PREPROCESSOR.shutdown()
+
+    report(args, elapsed, latencies, first_results, outcomes)
+    print(f"\nguard: {GEMINI_GUARD.stats()}")
+    for name, flight in SINGLE_FLIGHTS.items():
+        print(f"single-flight {name}: {flight.stats()}")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def report(args, elapsed, latencies, first_results, outcomes):
+    print(f"mode={args.mode} requests={args.requests} concurrency={args.concurrency} "
+          f"latency={args.latency}s sigma={args.sigma} error_rate={args.error_rate} repeat={args.repeat}")
+    print(f"throughput: {len(latencies) / elapsed:.1f} req/s over {elapsed:.2f}s")
+    print(f"outcomes:   {outcomes}")
+    print(f"{'':12} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    rows = [("latency", latencies)]
+    if first_results:
+        rows.append(("first item", first_results))
+    for label, values in rows:
+        print(f"{label:12} {statistics.mean(values):>8.3f} {percentile(values, 50):>8.3f} "
+              f"{percentile(values, 90):>8.3f} {percentile(values, 99):>8.3f} {max(values):>8.3f}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as work_dir:
+        configure_environment(args, work_dir)
+        paths = make_images(args, work_dir)
+        asyncio.run(run(args, paths))
+    sys.exit(0)
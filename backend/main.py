@@ -1,24 +1,54 @@
 from fastapi import FastAPI, Request
 from fastapi import HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from fastapi import Depends
-from sqlalchemy.orm import Session
-from typing import Annotated
+from fastapi import Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List, Optional
 
-from utils.models import Base, Project
-from utils.database import engine, SessionLocal, get_db
+from utils.models import Base, Project, dump_projects
+from utils.responses import render_json
+from utils.explore_cache import EXPLORE_CACHE
+from utils.pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, InvalidCursor
+from utils.database import close_engines, get_db, get_read_db, run_migrations, AUTO_MIGRATE, LAST_WRITE_HEADER, ReadYourWritesMiddleware
 from routers.auth import router as auth_router
 from routers.project import router as project_router
 from routers.user import router as user_router
-
+from routers.metrics import router as metrics_router
+from services.idea_worker import start_workers, JOB_WORKERS
+from services.project_service import ProjectService, INDEX_SYNC
+from utils.image_preprocess import IMAGE_PREPROCESSOR
+from utils.logging_config import setup_logging, shutdown_logging, RequestContextMiddleware
+
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 
-app = FastAPI()
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_MIGRATE:
+        await asyncio.to_thread(run_migrations)
+    # indeksler yalnızca bellekte tutulur, her açılışta veritabanından yüklenir
+    await asyncio.to_thread(INDEX_SYNC.load)
+    # JOB_WORKERS=0 ise job'lar ayrı bir worker process tarafından işlenir
+    worker_tasks = start_workers(JOB_WORKERS) if JOB_WORKERS > 0 else []
+    yield
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    IMAGE_PREPROCESSOR.shutdown()
+    await close_engines()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # STATIC_DIR = os.path.join(BASE_DIR, "static")
@@ -32,9 +62,11 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_FOLDER), name="uploads")
 app.include_router(auth_router)
 app.include_router(project_router)
 app.include_router(user_router)
+app.include_router(metrics_router)
 
-Base.metadata.create_all(bind=engine)
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# public listeler replikadan okunur
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,22 +74,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", LAST_WRITE_HEADER],
 )
+# yazan istemcinin sonraki okumaları hangi worker'a düşerse düşsün primary'den yapılır
+app.add_middleware(ReadYourWritesMiddleware)
+# en dışta çalışır, CORS ve hata yanıtları da request id ile loglanır
+app.add_middleware(RequestContextMiddleware)
+
+
+async def _explore_page(db, have, limit, cursor) -> str:
+    if have:
+        projects, next_cursor, match = await ProjectService(db).list_buildable_projects(have, limit=limit, cursor=cursor)
+    else:
+        projects, next_cursor = await ProjectService(db).list_public_projects(limit=limit, cursor=cursor)
+        match = {}
+    return render_json({"items": dump_projects(projects), "next_cursor": next_cursor, **match}).decode()
+
+
+async def _search_page(db, keyword, limit, cursor) -> str:
+    results, next_cursor = await ProjectService(db).search_public_projects(keyword, limit=limit, cursor=cursor)
+    projects = dump_projects(project for project, _ in results)
+    items = [ { **item, "snippet": snippet } for item, (_, snippet) in zip(projects, results) ]
+    return render_json({"items": items, "next_cursor": next_cursor}).decode()
+
+
+async def _cached(db, key, loader):
+    # yeni yazan kullanıcı önbelleği atlar, kendi değişikliğini hemen görür
+    if db.info.get("recent_writer"):
+        return await loader(db)
+    return await EXPLORE_CACHE.get_or_load(key, loader)
 
 
 @app.get("/explore", status_code=status.HTTP_200_OK) # Project get/query
 async def get_public_ideas(request: Request, 
-                    db: db_dependency): 
+                    db: read_db_dependency,
+                    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+                    cursor: Optional[str] = None,
+                    materials: Optional[List[str]] = Query(None)): 
     # fotoğraflar static/uploads içerisinde bulunuyor
-    # only public projects will be returned
+    # only public projects will be returned, newest first
+    # sonraki sayfa için bir önceki yanıttaki next_cursor gönderilir
+    # materials verilirse (?materials=makas&materials=boya ya da "makas,boya") yalnızca
+    # bu malzemelerle yapılabilen projeler döner, facet sayılarıyla birlikte
+    # sayfalar EXPLORE_CACHE'ten gelir, public projeler değişince önbellek temizlenir
 
-    public_projects = db.query(Project).filter(Project.is_public == True).all()
-    if not public_projects:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No public projects found")
-    return JSONResponse(content=public_projects)
+    have = sorted(item.strip() for value in materials or [] for item in value.split(",") if item.strip())
+    key = f"explore:{limit}:{cursor or ''}:{','.join(have)}"
+    try:
+        body = await _cached(db, key, lambda session: _explore_page(session, have, limit, cursor))
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/explore/{keyword}", status_code=status.HTTP_200_OK)
-async def search_public_ideas(request: Request, db: db_dependency, keyword: str):
-    pass 
-
+async def search_public_ideas(request: Request,
+                    db: read_db_dependency,
+                    keyword: str,
+                    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+                    cursor: Optional[str] = None):
+    # public projelerde başlık, açıklama ve malzemelerde tam metin arama, en iyi eşleşme önce
+    # snippet HTML-escape edilmiştir, içinde eşleşen kelimeler <mark> ile işaretlenir
+
+    key = f"search:{limit}:{cursor or ''}:{keyword.lower()}"
+    try:
+        body = await _cached(db, key, lambda session: _search_page(session, keyword, limit, cursor))
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return Response(content=body, media_type="application/json")
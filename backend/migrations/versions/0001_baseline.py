@@ -0,0 +1,70 @@
+"""baseline schema
+
+Tables as they existed before migrations were introduced. Databases created
+earlier with Base.metadata.create_all already have them, so each table is only
+created when it is missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), unique=True),
+            sa.Column("email", sa.String(), unique=True),
+            sa.Column("first_name", sa.String()),
+            sa.Column("last_name", sa.String()),
+            sa.Column("hashed_password", sa.String()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if "project" not in existing:
+        op.create_table(
+            "project",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("title", sa.String()),
+            sa.Column("description", sa.String()),
+            sa.Column("materials", sa.String()),
+            sa.Column("roadmap", sa.String()),
+            sa.Column("image", sa.String()),
+            sa.Column("created_at", sa.String()),
+            sa.Column("recycled_image", sa.String()),
+            sa.Column("is_public", sa.Boolean()),
+        )
+        op.create_index("ix_project_id", "project", ["id"])
+
+    if "roadmap_step" not in existing:
+        op.create_table(
+            "roadmap_step",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("project_id", sa.Integer(), sa.ForeignKey("project.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("step_number", sa.Integer(), nullable=False),
+            sa.Column("title", sa.String()),
+            sa.Column("description", sa.String()),
+            sa.Column("estimated_time", sa.String()),
+            sa.Column("materials_needed", sa.JSON()),
+        )
+        op.create_index("ix_roadmap_step_id", "roadmap_step", ["id"])
+        op.create_index("ix_roadmap_step_project_step", "roadmap_step", ["project_id", "step_number"], unique=True)
+
+
+def downgrade():
+    op.drop_table("roadmap_step")
+    op.drop_table("project")
+    op.drop_table("users")
@@ -0,0 +1,73 @@
+"""store project materials and roadmap as JSON lists
+
+materials and roadmap used to be saved as "{item}-{item}" strings and split on
+"-" when read, which broke items containing a hyphen. Existing rows are parsed
+by their braces instead, so "{re-use}" stays one item, and rewritten as JSON.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+import json
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+_BRACED_ITEM = re.compile(r"\{([^{}]*)\}")
+
+project = sa.table(
+    "project",
+    sa.column("id", sa.Integer()),
+    sa.column("materials", sa.String()),
+    sa.column("roadmap", sa.String()),
+)
+
+
+def decode_legacy(value):
+    if value is None or value == "":
+        return []
+    if value.startswith("["):
+        try:
+            return json.loads(value) # zaten dönüştürülmüş
+        except ValueError:
+            pass
+    items = _BRACED_ITEM.findall(value)
+    if items:
+        return items
+    return [item for item in value.split("-") if item]
+
+
+def encode_legacy(items):
+    return "-".join(f"{{{item}}}" for item in items or [])
+
+
+def _rewrite(convert):
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(project.c.id, project.c.materials, project.c.roadmap)).fetchall()
+    for row in rows:
+        bind.execute(
+            project.update()
+            .where(project.c.id == row.id)
+            .values(materials=convert(row.materials), roadmap=convert(row.roadmap))
+        )
+
+
+def upgrade():
+    _rewrite(lambda value: json.dumps(decode_legacy(value), ensure_ascii=False))
+    with op.batch_alter_table("project") as batch:
+        batch.alter_column("materials", existing_type=sa.String(), type_=sa.JSON(), postgresql_using="materials::json")
+        batch.alter_column("roadmap", existing_type=sa.String(), type_=sa.JSON(), postgresql_using="roadmap::json")
+
+
+def downgrade():
+    with op.batch_alter_table("project") as batch:
+        batch.alter_column("materials", existing_type=sa.JSON(), type_=sa.String())
+        batch.alter_column("roadmap", existing_type=sa.JSON(), type_=sa.String())
+    _rewrite(lambda value: encode_legacy(json.loads(value) if value else []))
@@ -0,0 +1,81 @@
+"""typed project timestamps and listing indexes
+
+created_at was a "%Y-%m-%d %H:%M:%S" UTC string. It becomes a timezone-aware
+timestamp (timestamptz on PostgreSQL, naive UTC on SQLite), updated_at is added
+and starts equal to created_at. The composite indexes serve the two listing
+queries, my-ideas (user_id, created_at) and explore (is_public, created_at),
+without a sort step.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+LEGACY_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_legacy(value, default):
+    """Legacy created_at string as an aware UTC datetime; missing or broken values get default."""
+    if not value:
+        return default
+    try:
+        parsed = datetime.strptime(value[:19], LEGACY_FORMAT)
+    except ValueError:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return default
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _copy(source, target, target_type, convert):
+    # değerler Python'da dönüştürülür; SQLite'ta batch CAST tarih metnini sayıya çevirirdi
+    table = sa.table("project", sa.column("id", sa.Integer()), sa.column(source, sa.String()), sa.column(target, target_type))
+    bind = op.get_bind()
+    for row in bind.execute(sa.select(table.c.id, table.c[source])).fetchall():
+        bind.execute(table.update().where(table.c.id == row.id).values({target: convert(row[1])}))
+
+
+def upgrade():
+    now = datetime.now(tz=timezone.utc)
+    with op.batch_alter_table("project") as batch:
+        batch.add_column(sa.Column("created_at_utc", sa.DateTime(timezone=True), nullable=True))
+    _copy("created_at", "created_at_utc", sa.DateTime(timezone=True), lambda value: parse_legacy(value, now))
+
+    with op.batch_alter_table("project") as batch:
+        batch.drop_column("created_at")
+        batch.alter_column("created_at_utc", new_column_name="created_at", existing_type=sa.DateTime(timezone=True), nullable=False)
+        batch.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE project SET updated_at = created_at")
+
+    with op.batch_alter_table("project") as batch:
+        batch.alter_column("updated_at", existing_type=sa.DateTime(timezone=True), nullable=False)
+        batch.create_index("ix_project_user_created", ["user_id", "created_at"])
+        batch.create_index("ix_project_public_created", ["is_public", "created_at"])
+
+
+def downgrade():
+    with op.batch_alter_table("project") as batch:
+        batch.drop_index("ix_project_public_created")
+        batch.drop_index("ix_project_user_created")
+        batch.drop_column("updated_at")
+        batch.add_column(sa.Column("created_at_text", sa.String(), nullable=True))
+    _copy(
+        "created_at", "created_at_text", sa.String(),
+        lambda value: value.astimezone(timezone.utc).strftime(LEGACY_FORMAT) if isinstance(value, datetime) else (value or "")[:19] or None
+    )
+    with op.batch_alter_table("project") as batch:
+        batch.drop_column("created_at")
+        batch.alter_column("created_at_text", new_column_name="created_at", existing_type=sa.String())
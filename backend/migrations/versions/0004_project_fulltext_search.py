@@ -0,0 +1,99 @@
+"""full-text search over public projects
+
+SQLite: an FTS5 table project_fts (rowid = project.id) holding the title,
+description and comma-joined materials of public projects. Triggers on project
+keep it in sync on insert, edit, visibility change and delete.
+
+PostgreSQL: a generated tsvector column project.search_vector (title weighted
+A, description B, materials C) with a GIN index limited to public rows.
+
+Neither object is part of the ORM metadata; env.py leaves them out of
+autogenerate. SQLite batch migrations recreate the project table and drop its
+triggers, so a later batch migration on project has to run create_sqlite_triggers
+again.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Türkçe karakterler aksansız yazılsa da eşleşsin: "sise" -> "şişe"
+SQLITE_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS project_fts USING fts5(
+    title, description, materials,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+SQLITE_FTS_INSERT = """
+INSERT INTO project_fts(rowid, title, description, materials)
+SELECT {row}.id, coalesce({row}.title, ''), coalesce({row}.description, ''),
+       coalesce((SELECT group_concat(value, ', ') FROM json_each({row}.materials)), '')
+"""
+
+SQLITE_TRIGGERS = {
+    "project_fts_insert": """
+CREATE TRIGGER IF NOT EXISTS project_fts_insert AFTER INSERT ON project
+WHEN new.is_public
+BEGIN
+""" + SQLITE_FTS_INSERT.format(row="new") + """;
+END
+""",
+    "project_fts_update": """
+CREATE TRIGGER IF NOT EXISTS project_fts_update AFTER UPDATE OF title, description, materials, is_public ON project
+BEGIN
+    DELETE FROM project_fts WHERE rowid = old.id;
+""" + SQLITE_FTS_INSERT.format(row="new") + """ WHERE new.is_public;
+END
+""",
+    "project_fts_delete": """
+CREATE TRIGGER IF NOT EXISTS project_fts_delete AFTER DELETE ON project
+BEGIN
+    DELETE FROM project_fts WHERE rowid = old.id;
+END
+""",
+}
+
+POSTGRESQL_SEARCH_VECTOR = """
+ALTER TABLE project ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(materials::text, '')), 'C')
+) STORED
+"""
+
+
+def create_sqlite_triggers():
+    for ddl in SQLITE_TRIGGERS.values():
+        op.execute(ddl)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute(SQLITE_FTS_TABLE)
+        create_sqlite_triggers()
+        # mevcut public projeler indekslenir
+        op.execute("DELETE FROM project_fts")
+        op.execute(SQLITE_FTS_INSERT.format(row="project") + " FROM project WHERE project.is_public")
+    elif dialect == "postgresql":
+        op.execute(POSTGRESQL_SEARCH_VECTOR)
+        op.execute("CREATE INDEX ix_project_search ON project USING gin (search_vector) WHERE is_public")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS project_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_project_search")
+        op.execute("ALTER TABLE project DROP COLUMN IF EXISTS search_vector")
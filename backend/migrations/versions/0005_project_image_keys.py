@@ -0,0 +1,59 @@
+"""project images stored as keys under static/
+
+image and recycled_image held whatever path the upload was saved under,
+usually absolute ("/srv/app/static/uploads/abc.jpg"), and ProjectSchema cut
+them down to "uploads/abc.jpg" on every read. They now hold that key; the file
+is found again under the static directory. Only values change, the table is
+not rebuilt, so the SQLite full-text triggers of 0004 stay in place.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "static")
+COLUMNS = ("image", "recycled_image")
+
+
+def to_key(path):
+    if not path:
+        return path
+    parts = path.replace("\\", "/").split("/")
+    if "uploads" in parts:
+        return "/".join(parts[parts.index("uploads"):])
+    return path
+
+
+def to_path(key):
+    if not key or not key.startswith("uploads/"):
+        return key
+    return os.path.join(STATIC_DIR, key)
+
+
+def _convert(convert):
+    table = sa.table("project", sa.column("id", sa.Integer()), *(sa.column(name, sa.String()) for name in COLUMNS))
+    bind = op.get_bind()
+    for row in bind.execute(sa.select(table.c.id, *(table.c[name] for name in COLUMNS))).fetchall():
+        current = row._mapping
+        values = {name: convert(current[name]) for name in COLUMNS}
+        values = {name: value for name, value in values.items() if value != current[name]}
+        if values:
+            bind.execute(table.update().where(table.c.id == row.id).values(values))
+
+
+def upgrade():
+    _convert(to_key)
+
+
+def downgrade():
+    _convert(to_path)
@@ -0,0 +1,102 @@
+"""project change log for the in-memory search indexes
+
+Every API worker keeps its own in-memory indexes over projects (the similar
+project index and the material index). project_change lists which projects changed, in order, so a
+worker can bring its copy up to date by re-reading only those projects. Rows
+are written by triggers on insert, delete and updates of the indexed columns,
+whatever the write path; the triggers keep the newest KEEP_CHANGES rows, a
+worker that falls further behind rebuilds from the project table.
+
+Like the full-text triggers of 0004, SQLite batch migrations recreate the
+project table and drop these triggers, so a later batch migration on project
+has to run create_sqlite_triggers again.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+KEEP_CHANGES = 10000
+INDEXED_COLUMNS = "title, description, materials, is_public"
+
+PRUNE = f"DELETE FROM project_change WHERE id <= (SELECT max(id) FROM project_change) - {KEEP_CHANGES}"
+
+SQLITE_TRIGGERS = {
+    "project_change_insert": f"""
+CREATE TRIGGER IF NOT EXISTS project_change_insert AFTER INSERT ON project
+BEGIN
+    INSERT INTO project_change (project_id) VALUES (new.id);
+    {PRUNE};
+END
+""",
+    "project_change_update": f"""
+CREATE TRIGGER IF NOT EXISTS project_change_update AFTER UPDATE OF {INDEXED_COLUMNS} ON project
+BEGIN
+    INSERT INTO project_change (project_id) VALUES (new.id);
+    {PRUNE};
+END
+""",
+    "project_change_delete": f"""
+CREATE TRIGGER IF NOT EXISTS project_change_delete AFTER DELETE ON project
+BEGIN
+    INSERT INTO project_change (project_id) VALUES (old.id);
+    {PRUNE};
+END
+""",
+}
+
+POSTGRESQL_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION project_change_log() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO project_change (project_id) VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+    {PRUNE};
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+POSTGRESQL_TRIGGER = f"""
+CREATE TRIGGER project_change_log
+AFTER INSERT OR DELETE OR UPDATE OF {INDEXED_COLUMNS} ON project
+FOR EACH ROW EXECUTE FUNCTION project_change_log()
+"""
+
+
+def create_sqlite_triggers():
+    for ddl in SQLITE_TRIGGERS.values():
+        op.execute(ddl)
+
+
+def upgrade():
+    op.create_table(
+        "project_change",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        # SQLite: silinen en büyük id yeniden verilmesin
+        sqlite_autoincrement=True,
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        create_sqlite_triggers()
+    elif dialect == "postgresql":
+        op.execute(POSTGRESQL_FUNCTION)
+        op.execute(POSTGRESQL_TRIGGER)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    elif dialect == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS project_change_log ON project")
+        op.execute("DROP FUNCTION IF EXISTS project_change_log()")
+    op.drop_table("project_change")
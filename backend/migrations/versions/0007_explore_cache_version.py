@@ -0,0 +1,102 @@
+"""explore cache version kept in the database
+
+The explore cache drops every cached page when the set of public projects
+changes: a project becomes public or private, or a public project is deleted
+or inserted. The counter of those changes lived in each API worker, so a
+worker that did not make the write kept serving its old pages. It is now the
+single row 'explore' of cache_version, bumped by triggers in the same
+transaction as the change, and every worker compares it before serving a
+cached page.
+
+Like the triggers of 0004 and 0006, SQLite batch migrations recreate the
+project table and drop these triggers, so a later batch migration on project
+has to run create_sqlite_triggers again.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+BUMP = "UPDATE cache_version SET version = version + 1 WHERE name = 'explore'"
+
+SQLITE_TRIGGERS = {
+    "explore_version_insert": f"""
+CREATE TRIGGER IF NOT EXISTS explore_version_insert AFTER INSERT ON project
+WHEN new.is_public
+BEGIN
+    {BUMP};
+END
+""",
+    "explore_version_update": f"""
+CREATE TRIGGER IF NOT EXISTS explore_version_update AFTER UPDATE OF is_public ON project
+WHEN coalesce(old.is_public, 0) != coalesce(new.is_public, 0)
+BEGIN
+    {BUMP};
+END
+""",
+    "explore_version_delete": f"""
+CREATE TRIGGER IF NOT EXISTS explore_version_delete AFTER DELETE ON project
+WHEN old.is_public
+BEGIN
+    {BUMP};
+END
+""",
+}
+
+POSTGRESQL_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION explore_version_bump() RETURNS trigger AS $$
+BEGIN
+    IF (TG_OP = 'INSERT' AND coalesce(NEW.is_public, false))
+        OR (TG_OP = 'DELETE' AND coalesce(OLD.is_public, false))
+        OR (TG_OP = 'UPDATE' AND coalesce(OLD.is_public, false) != coalesce(NEW.is_public, false)) THEN
+        {BUMP};
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+POSTGRESQL_TRIGGER = """
+CREATE TRIGGER explore_version_bump
+AFTER INSERT OR DELETE OR UPDATE OF is_public ON project
+FOR EACH ROW EXECUTE FUNCTION explore_version_bump()
+"""
+
+
+def create_sqlite_triggers():
+    for ddl in SQLITE_TRIGGERS.values():
+        op.execute(ddl)
+
+
+def upgrade():
+    cache_version = op.create_table(
+        "cache_version",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.bulk_insert(cache_version, [{"name": "explore", "version": 0}])
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        create_sqlite_triggers()
+    elif dialect == "postgresql":
+        op.execute(POSTGRESQL_FUNCTION)
+        op.execute(POSTGRESQL_TRIGGER)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for name in SQLITE_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    elif dialect == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS explore_version_bump ON project")
+        op.execute("DROP FUNCTION IF EXISTS explore_version_bump()")
+    op.drop_table("cache_version")
@@ -0,0 +1,55 @@
+"""accent-insensitive full-text search on PostgreSQL
+
+SQLite's FTS5 tokenizer of 0004 already drops diacritics, so "sise" finds
+"şişe"; the 'simple' configuration of the PostgreSQL search_vector kept them.
+This adds the unaccent extension and a text search configuration
+project_search (simple with unaccent in front), rebuilds search_vector and its
+index with it, and utils/fulltext.py parses queries with the same
+configuration. Creating the extension needs a role allowed to do so (the
+database owner on PostgreSQL 13+, where unaccent is a trusted extension).
+
+Nothing changes on SQLite.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = """
+ALTER TABLE project ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('{config}', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('{config}', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('{config}', coalesce(materials::text, '')), 'C')
+) STORED
+"""
+
+
+def rebuild_search_vector(config):
+    op.execute("DROP INDEX IF EXISTS ix_project_search")
+    op.execute("ALTER TABLE project DROP COLUMN IF EXISTS search_vector")
+    op.execute(SEARCH_VECTOR.format(config=config))
+    op.execute("CREATE INDEX ix_project_search ON project USING gin (search_vector) WHERE is_public")
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE TEXT SEARCH CONFIGURATION project_search (COPY = simple)")
+    # Türkçe karakterler aksansız yazılsa da eşleşsin: "sise" -> "şişe"
+    op.execute("ALTER TEXT SEARCH CONFIGURATION project_search ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple")
+    rebuild_search_vector("project_search")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    rebuild_search_vector("simple")
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS project_search")
@@ -1,13 +1,15 @@
 from datetime import timedelta, datetime, timezone
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Request
 from starlette import status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from typing import Annotated
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse
-from utils.database import SessionLocal, get_db
+from utils.database import get_db
 from utils.models import User, Base
 from utils.auth import *
 
@@ -25,7 +27,7 @@ templates_directory = os.path.join(project_directory, "frontend", "templates") #
 templates = Jinja2Templates(directory=templates_directory)
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(verify_token)]
 
 class CreateUserRequest(BaseModel):
@@ -57,7 +59,7 @@ async def create_user(
                       db: db_dependency):
 
     # kullanıcı var mı kontrolü
-    existing_user = db.query(User).filter(User.email == createUserRequest.email).first()
+    existing_user = (await db.execute(select(User).filter(User.email == createUserRequest.email))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="User already exists")
     
@@ -68,15 +70,14 @@ async def create_user(
             email = createUserRequest.email,
             first_name = createUserRequest.first_name,
             last_name = createUserRequest.last_name,
-            hashed_password = bcrypt_context.hash(createUserRequest.password),
+            hashed_password = await asyncio.to_thread(bcrypt_context.hash, createUserRequest.password),
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Internal server error")
-
     return JSONResponse(
         # user yerine direkt göndermek gerekebilir
         content={"user": {
@@ -100,7 +101,7 @@ async def login_user(request: LoginRequest, db: db_dependency):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username and password are required"
         )
-    user = authenticate_user(db, username, password)
+    user = await authenticate_user(db, username, password)
     token = create_access_token(
         username=user.username, 
         user_id=user.id, 
@@ -128,7 +129,7 @@ async def refresh_token(user: user_dependency, db: db_dependency):
     - new access token
     """
     try:
-        db_user = get_user_by_id(db, user["user_id"])
+        db_user = await get_user_by_id(db, user["user_id"])
 
         new_token = create_access_token(
             username=db_user.username,
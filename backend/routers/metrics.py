@@ -0,0 +1,65 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from utils.idea_cache import IDEA_CACHE
+from utils.image_index import IMAGE_INDEX
+from utils.singleflight import SINGLE_FLIGHTS
+from utils.image_preprocess import IMAGE_PREPROCESSOR
+from utils.resilience import GEMINI_GUARD
+from utils.project_index import PROJECT_INDEX
+from utils.materials import MATERIAL_INDEX
+from utils.database import pool_stats
+from services.project_service import INDEX_SYNC
+from utils.explore_cache import EXPLORE_CACHE
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+
+@router.get("/idea-cache", status_code=status.HTTP_200_OK)
+async def get_idea_cache_stats():
+    return JSONResponse(content=IDEA_CACHE.stats())
+
+
+@router.get("/image-index", status_code=status.HTTP_200_OK)
+async def get_image_index_stats():
+    return JSONResponse(content={"entries": len(IMAGE_INDEX)})
+
+
+@router.get("/single-flight", status_code=status.HTTP_200_OK)
+async def get_single_flight_stats():
+    return JSONResponse(content={name: flight.stats() for name, flight in SINGLE_FLIGHTS.items()})
+
+
+@router.get("/image-preprocess", status_code=status.HTTP_200_OK)
+async def get_image_preprocess_stats():
+    return JSONResponse(content=IMAGE_PREPROCESSOR.stats())
+
+
+@router.get("/gemini", status_code=status.HTTP_200_OK)
+async def get_gemini_stats():
+    return JSONResponse(content=GEMINI_GUARD.stats())
+
+
+@router.get("/project-index", status_code=status.HTTP_200_OK)
+async def get_project_index_stats():
+    return JSONResponse(content={**PROJECT_INDEX.stats(), "sync": INDEX_SYNC.stats()})
+
+
+@router.get("/material-index", status_code=status.HTTP_200_OK)
+async def get_material_index_stats():
+    return JSONResponse(content=MATERIAL_INDEX.stats())
+
+
+@router.get("/database", status_code=status.HTTP_200_OK)
+async def get_database_pool_stats():
+    return JSONResponse(content=pool_stats())
+
+
+@router.get("/explore-cache", status_code=status.HTTP_200_OK)
+async def get_explore_cache_stats():
+    return JSONResponse(content=EXPLORE_CACHE.stats())
@@ -5,52 +5,61 @@ create_ideas
 get_roadmap
 """
 from pydantic import BaseModel, Field
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from starlette import status
 from starlette.responses import RedirectResponse
 from utils.models import Base, Project
-from utils.database import engine, SessionLocal
 from typing import Annotated
-from fastapi import APIRouter, Depends, Path, HTTPException, Request
+from fastapi import APIRouter, Depends, Path, HTTPException, Request, BackgroundTasks
 from fastapi import UploadFile, File, Body
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import Form
 
-from fastapi.templating import Jinja2Templates
-
 from dotenv import load_dotenv
 import os
 
 import json
 
-import google.generativeai as genai
-
 import uuid
+import asyncio
+import hashlib
 import aiofiles
+from starlette.concurrency import run_in_threadpool
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage
-import markdown
-from bs4 import BeautifulSoup
-
-from utils.database import SessionLocal, get_db
-from utils.models import User, Base, Project, ProjectSchema
+from utils.database import get_db, get_read_db
+from utils.models import User, Base, Project, ProjectSchema, InvalidImageKey, dump_projects, image_file, image_key
+from utils.responses import ORJSONResponse
 from utils.auth import *
-from utils.geminiConnection import process_image_with_gemini
+from utils.geminiConnection import generate_ideas, image_cache_key, stream_ideas
+from utils.image_index import IMAGE_INDEX
+from utils.job_queue import get_job_queue, DONE, FAILED
+from services.idea_worker import JOB_POLL_INTERVAL
+from services.project_service import ProjectService, generate_project_roadmap, INDEX_SYNC, ROADMAP_PREGENERATE, PROJECT_RAG_DIRECT_SCORE
+from utils.materials import MATERIAL_INDEX
+from utils.gemini_service import FALLBACK_ROADMAP
+from utils.logging_config import get_logger, span
 
 
 BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BASE_DIR = os.path.dirname(BACKEND_DIR)
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "20"))
+# tek bir batch'in global Gemini limitini tek başına doldurmaması için
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
 
 router = APIRouter(
     prefix="/project",
     tags=["Project"]
 )
 
+logger = get_logger(__name__)
+
 class EditRequest(BaseModel):
     recycled_image: str
     is_public: bool = Field(default=False)
@@ -63,38 +72,11 @@ class IdeaRequest(BaseModel):
     roadmap: List[str]
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+# yalnızca okuyan endpoint'ler, replika varsa oradan (kullanıcı yeni yazdıysa primary'den)
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 user_dependency = Annotated[dict, Depends(verify_token)]
 
-# yapılacak
-def ask_gemini(image):
-    example = [
-        {
-            "title": "Kalemlik",
-            "description": "Kullanılmayan bardağı bir kalemliğe dönüştürün.",
-            "materials": ["Cam Boyası"],
-            "roadmap": [
-                "Bardağı temizleyin.",
-                "Cam boyası ile bardağı boyayın.",
-                "Bardak kuruduktan sonra kalemlerinizi yerleştirin."
-            ]
-        },
-        {
-            "title": "Gece Lambası",
-            "description": "Kullanılmayan bardağı gece lambası yapın.",
-            "materials": ["LED ışık", "Kablo", "Mukavva"],
-            "roadmap": [
-                "Bardağı temizleyin.",
-                "Mukavvadan bir taban kesin.",
-                "LED ışığını bardağa yerleştirin.",
-                "Mukavvayı bardağın altına yapıştırın.",
-                "LED ışığını bir güç kaynağına bağlayın.",
-                "Bardağı bir lamba olarak kullanın."
-            ]
-        }
-    ]
-    return example
-
 async def save_image(image: UploadFile):
     if image.content_type not in ["image/jpeg", "image/png"]:
         raise HTTPException(status_code=400, detail="Sadece JPG veya PNG dosyaları kabul edilir.")
@@ -103,14 +85,30 @@ async def save_image(image: UploadFile):
     unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
     file_path = os.path.join(STATIC_DIR, "uploads", unique_filename)
 
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await image.read()
-        await out_file.write(content)
+    # dosya parça parça yazılır, büyük görseller belleğe tek seferde alınmaz
+    digest = hashlib.sha256()
+    with span("upload_write"):
+        async with aiofiles.open(file_path, 'wb') as out_file:
+            while chunk := await image.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await out_file.write(chunk)
 
-    print(f"Image saved to {file_path}")
+    # benzer görsel araması için perceptual hash indeksine ekle
+    with span("image_index"):
+        await run_in_threadpool(_index_image, file_path, digest.hexdigest())
 
     return file_path
 
+def _index_image(file_path, digest):
+    with open(file_path, 'rb') as f:
+        IMAGE_INDEX.add(file_path, f.read(), digest)
+
+def _encode_message(message, use_sse):
+    payload = json.dumps(message, ensure_ascii=False)
+    if use_sse:
+        return f"event: {message['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
 
 # yapılacak
 @router.post("/create-ideas", status_code=status.HTTP_200_OK)
@@ -118,7 +116,9 @@ async def get_recycle_ideas(
                     request: Request,
                     user:user_dependency,
                     db: db_dependency,
-                    image: UploadFile = File(...)
+                    image: UploadFile = File(...),
+                    item_hint: Optional[str] = Form(None),
+                    background: bool = False
                 ): 
     try:
         # token = request.cookies.get("access_token")
@@ -148,9 +148,44 @@ async def get_recycle_ideas(
     geri dönüşüm fikri ikinci onaydan geçerse bize ajax onayı döner 
     ve biz de bu projeyi veritabanına kaydederiz
     """
-                    
-    ideas = process_image_with_gemini(image_path)
-    print(type(ideas))
+
+    # kullanıcı nesneyi tarif ettiyse kayıtlı public projeler arasında benzerleri aranır
+    context_ideas = None
+    direct_ideas = None
+    if item_hint:
+        with span("retrieval"):
+            matches = await ProjectService(db).find_similar_projects(item_hint)
+        direct_ideas = [idea for score, idea in matches if score >= PROJECT_RAG_DIRECT_SCORE] or None
+        context_ideas = None if direct_ideas else ([idea for score, idea in matches] or None)
+
+    if background:
+        # job kuyruğa alınır, sonuç /project/jobs/{job_id} üzerinden alınır;
+        # doğrudan eşleşen projeler varsa job tamamlanmış olarak oluşturulur, yanıt her zaman 202 + job_id
+        queue = get_job_queue()
+        if direct_ideas:
+            job = await run_in_threadpool(
+                queue.enqueue, image_path, None, None, {"ideas": direct_ideas, "source": "projects"},
+                user_id=verified_user["user_id"]
+            )
+        else:
+            # job'lar kullanıcılar arasında paylaşılmaz
+            dedup_key = f"{verified_user['user_id']}:{await image_cache_key(image_path, context_ideas)}"
+            job = await run_in_threadpool(
+                queue.enqueue, image_path, dedup_key, context_ideas, user_id=verified_user["user_id"]
+            )
+        return JSONResponse(
+            content={
+                "image": image_path,
+                "job_id": job["id"],
+                "status": job["status"]
+            },
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+    if direct_ideas:
+        return JSONResponse(content={"image": image_path, "ideas": direct_ideas, "source": "projects"})
+
+    ideas = await generate_ideas(image_path, context_ideas=context_ideas)
 
     content = {
         "image": image_path,
@@ -160,6 +195,180 @@ async def get_recycle_ideas(
     return JSONResponse(content=content)
     
 
+@router.post("/create-ideas/stream", status_code=status.HTTP_200_OK)
+async def stream_recycle_ideas(
+                    request: Request,
+                    user: user_dependency,
+                    image: UploadFile = File(...)
+                ):
+    """
+    Streaming variant of /create-ideas, every idea is sent as soon as it is ready.
+
+    Response is NDJSON by default, or Server-Sent Events when the client sends
+    `Accept: text/event-stream`. Messages:
+        {"type": "image", "image": ...}
+        {"type": "idea", "index": 0, "idea": {...}}
+        {"type": "done", "count": 3}   or   {"type": "error", "detail": ...}
+    """
+    image_path = await save_image(image)
+    use_sse = "text/event-stream" in request.headers.get("Accept", "")
+
+    def encode(message):
+        return _encode_message(message, use_sse)
+
+    async def idea_stream():
+        yield encode({"type": "image", "image": image_path})
+        count = 0
+        try:
+            async for idea in stream_ideas(image_path):
+                yield encode({"type": "idea", "index": count, "idea": idea})
+                count += 1
+        except Exception as e:
+            logger.error("Error streaming ideas from Gemini: %s", e)
+            yield encode({"type": "error", "detail": "Idea generation failed"})
+            return
+        if count == 0:
+            yield encode({"type": "error", "detail": "Gemini did not return any ideas"})
+            return
+        yield encode({"type": "done", "count": count})
+
+    return StreamingResponse(
+        idea_stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.post("/create-ideas/batch", status_code=status.HTTP_200_OK)
+async def batch_recycle_ideas(
+                    request: Request,
+                    user: user_dependency,
+                    images: List[UploadFile] = File(...)
+                ):
+    """
+    Ideas for many images in one request, streamed per image as each one finishes.
+
+    All images are written to disk first, then generated concurrently (at most
+    BATCH_CONCURRENCY per batch, and under the global Gemini limit). A failing
+    image is reported as its own item and does not fail the batch. Response is
+    NDJSON, or Server-Sent Events with `Accept: text/event-stream`:
+        {"type": "item", "index": 0, "filename": ..., "image": ..., "ideas": [...]}
+        {"type": "item", "index": 1, "filename": ..., "error": ...}
+        {"type": "done", "count": 2, "succeeded": 1, "failed": 1}
+    """
+    if len(images) > BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"En fazla {BATCH_MAX_IMAGES} görsel yüklenebilir."
+        )
+    use_sse = "text/event-stream" in request.headers.get("Accept", "")
+
+    # yükleme dosyaları response başlamadan kapanabilir, hepsi önce diske yazılır
+    saved = []
+    for index, image in enumerate(images):
+        try:
+            saved.append((index, image.filename, await save_image(image), None))
+        except HTTPException as e:
+            saved.append((index, image.filename, None, e.detail))
+        except Exception as e:
+            logger.error("Could not save batch image %s: %s", image.filename, e)
+            saved.append((index, image.filename, None, "Image could not be saved"))
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def process(index, filename, image_path, error):
+        item = {"type": "item", "index": index, "filename": filename, "image": image_path}
+        if error is not None:
+            return {**item, "error": error}
+        try:
+            async with semaphore:
+                ideas = await generate_ideas(image_path)
+        except Exception as e:
+            logger.error("Batch idea generation failed for %s: %s", image_path, e)
+            return {**item, "error": "Idea generation failed"}
+        if not ideas:
+            return {**item, "error": "Gemini did not return any ideas"}
+        return {**item, "ideas": ideas}
+
+    async def batch_stream():
+        tasks = [asyncio.ensure_future(process(*entry)) for entry in saved]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                failed += "error" in item
+                yield _encode_message(item, use_sse)
+        finally:
+            # istemci bağlantıyı kapatırsa kalan çağrılar iptal edilir
+            for task in tasks:
+                task.cancel()
+        yield _encode_message(
+            {"type": "done", "count": len(tasks), "succeeded": len(tasks) - failed, "failed": failed},
+            use_sse
+        )
+
+    return StreamingResponse(
+        batch_stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+def _job_content(job):
+    content = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+    }
+    if job["status"] == DONE:
+        content["ideas"] = job["result"]["ideas"]
+        if "source" in job["result"]:
+            content["source"] = job["result"]["source"]
+    if job["status"] == FAILED:
+        content["error"] = job["error"]
+    return content
+
+
+def _own_job(job, user):
+    # başka kullanıcının job'ı yokmuş gibi davranılır
+    return job if job is not None and job.get("user_id") == user["user_id"] else None
+
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_idea_job(user: user_dependency, job_id: str):
+    job = _own_job(await run_in_threadpool(get_job_queue().get, job_id), user)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return JSONResponse(content=_job_content(job))
+
+
+@router.get("/jobs/{job_id}/events", status_code=status.HTTP_200_OK)
+async def stream_idea_job(request: Request, user: user_dependency, job_id: str):
+    """Server-Sent Events stream that pushes the job status until it finishes."""
+    queue = get_job_queue()
+    job = _own_job(await run_in_threadpool(queue.get, job_id), user)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    async def event_stream(job):
+        last_status = None
+        while job is not None:
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(_job_content(job), ensure_ascii=False)}\n\n"
+            if job["status"] in (DONE, FAILED) or await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            job = await run_in_threadpool(queue.get, job_id)
+        yield "event: expired\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 # system prompt
 """
 You are an assistant that generates upcycling DIY project ideas from an item image.
@@ -196,6 +405,7 @@ async def save_selected_idea(
                             request: Request,
                             user: user_dependency,
                             db: db_dependency,
+                            background_tasks: BackgroundTasks,
                             # idea: IdeaRequest
                         ):
     try:
@@ -206,7 +416,7 @@ async def save_selected_idea(
         if verified_user is None:
             return redirect_to_login()
         
-        user = get_user_by_id(db=db, user_id=verified_user["user_id"])
+        user = await get_user_by_id(db=db, user_id=verified_user["user_id"])
     except:
         return redirect_to_login()
     body = await request.json()
@@ -220,18 +430,29 @@ async def save_selected_idea(
     if not all([title, description, image_path, materials, roadmap]):
         raise HTTPException(status_code=400, detail="Missing required fields")
 
+    # görsel yolu istemciden gelir, yalnızca static/uploads altındaki yüklemeler kabul edilir
+    try:
+        if not isinstance(image_path, str) or not os.path.isfile(image_file(image_key(image_path))):
+            raise InvalidImageKey(image_path)
+    except InvalidImageKey:
+        raise HTTPException(status_code=400, detail="Invalid image_path")
+
     new_project = Project(
         user_id     = user.id,
-        image       = image_path,
+        image       = image_key(image_path),
         title       = title,
         description = description,
-        materials   = "-".join([f"{{{item}}}" for item in materials]),
-        roadmap     = "-".join([f"{{{item}}}" for item in roadmap]), 
-        created_at  = datetime.now(tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        materials   = list(materials),
+        roadmap     = list(roadmap),
     )
     db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
+    with span("db_commit"):
+        await db.commit()
+    await db.refresh(new_project)
+
+    # detaylı yol haritası response gönderildikten sonra üretilir
+    if ROADMAP_PREGENERATE:
+        background_tasks.add_task(generate_project_roadmap, new_project.id)
 
     return RedirectResponse(
         url=f"/project/my-ideas/{new_project.id}",
@@ -239,32 +460,41 @@ async def save_selected_idea(
     
 
 
+@router.get("/materials", status_code=status.HTTP_200_OK)
+async def get_materials(db: read_db_dependency, limit: int = 50):
+    # "elinizde hangi malzemeler var?" formu için public projelerde en çok geçen malzemeler
+    # seçilenler /explore?materials=... ile filtrelenir
+    await INDEX_SYNC.refresh(db)
+    vocabulary = MATERIAL_INDEX.vocabulary(limit=min(max(limit, 1), 500))
+    return JSONResponse(content=[{"material": material, "projects": count} for material, count in vocabulary])
+
 
 @router.get("/my-ideas", status_code=status.HTTP_200_OK)
 async def get_ideas(
                     request: Request, 
                     user: user_dependency,
-                    db: db_dependency):
+                    db: read_db_dependency):
     try:
         auth_header = request.headers.get("Authorization")
         token = auth_header.split(" ")[1]
         verified_user = verify_token(token)
         if verified_user is None:
             return redirect_to_login()
-        user = get_user_by_id(db=db, user_id=verified_user["user_id"])
+        user = await get_user_by_id(db=db, user_id=verified_user["user_id"])
     except:
         return redirect_to_login()
         
-    items = db.query(Project).filter(Project.user_id == user.id).all()
+    items = (await db.execute(
+        select(Project).filter(Project.user_id == user.id).order_by(Project.created_at.desc())
+    )).scalars().all()
 
-    response_data = [ ProjectSchema.model_validate(item).model_dump() for item in items ]
-    return JSONResponse(content=response_data)
+    return ORJSONResponse(content=dump_projects(items))
 
 @router.get("/my-ideas/{item_id}", status_code=status.HTTP_200_OK)  # Project get
 async def get_idea(
                     request: Request,
                     user: user_dependency,
-                    db: db_dependency,
+                    db: read_db_dependency,
                     item_id: int):
     try:
         # Retrieve token from Authorization header
@@ -275,12 +505,14 @@ async def get_idea(
         if verified_user is None:
             return redirect_to_login()
 
-        user = get_user_by_id(db=db, user_id=verified_user["user_id"])
+        user = await get_user_by_id(db=db, user_id=verified_user["user_id"])
     except:
         return redirect_to_login()
 
     # Fetch project from database
-    item = db.query(Project).filter(Project.id == item_id).filter(Project.user_id == user.id).first()
+    item = (await db.execute(
+        select(Project).filter(Project.id == item_id).filter(Project.user_id == user.id)
+    )).scalars().first()
     
     if item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
@@ -289,10 +521,37 @@ async def get_idea(
     response_data = ProjectSchema.model_validate(item).model_dump() 
     response_data["user"] = user.username
     
-    return JSONResponse(content=response_data)
+    return ORJSONResponse(content=response_data)
+
+
 
 
 
+@router.get("/my-ideas/{item_id}/roadmap", status_code=status.HTTP_200_OK)
+async def get_idea_roadmap(
+                    user: user_dependency,
+                    db: db_dependency,
+                    item_id: int):
+    """
+    Detailed step-by-step roadmap of a project, own or public.
+
+    Generated with Gemini on first request (unless it was already generated in
+    the background after save-idea) and served from the database afterwards.
+    When Gemini fails a generic roadmap is returned with status "unavailable"
+    and generation is retried on the next request.
+    """
+    item = (await db.execute(
+        select(Project)
+        .filter(Project.id == item_id)
+        .filter((Project.user_id == user["user_id"]) | (Project.is_public == True))
+    )).scalars().first()
+    if item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+
+    steps = await ProjectService(db).ensure_project_roadmap(item)
+    if steps is None:
+        return JSONResponse(content={"project_id": item.id, "status": "unavailable", "steps": FALLBACK_ROADMAP})
+    return JSONResponse(content={"project_id": item.id, "status": "ready", "steps": steps})
 
 
 @router.put("/my-ideas/{item_id}", status_code=status.HTTP_201_CREATED) # Project update/edit
@@ -304,7 +563,6 @@ async def edit_idea(
                     recycled_image: UploadFile = File(...),
                     is_public: bool = Form(...)
                     ):
-    print(item_id)
     try:
         auth_header = request.headers.get("Authorization")
         token = auth_header.split(" ")[1]
@@ -313,11 +571,13 @@ async def edit_idea(
         if verified_user is None:
             return redirect_to_login()
         
-        user = get_user_by_id(db=db, user_id=verified_user["user_id"])
+        user = await get_user_by_id(db=db, user_id=verified_user["user_id"])
     except:
         return redirect_to_login()
     
-    item = db.query(Project).filter(Project.id == item_id).filter(Project.user_id == user.id).first()
+    item = (await db.execute(
+        select(Project).filter(Project.id == item_id).filter(Project.user_id == user.id)
+    )).scalars().first()
     if item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     
@@ -325,14 +585,15 @@ async def edit_idea(
     # recycled_image = body.get("recycled_image")
     # is_public = body.get("is_public")
     image_path = await save_image(recycled_image)
-    item.recycled_image = image_path
+    item.recycled_image = image_key(image_path)
     item.is_public = is_public
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    with span("db_commit"):
+        await db.commit()
+    await db.refresh(item)
     response_data = ProjectSchema.model_validate(item).model_dump() 
     
-    return JSONResponse(content=response_data)
+    return ORJSONResponse(content=response_data)
 
 # what is delete status code
 
@@ -352,13 +613,20 @@ async def delete_idea(
         if verified_user is None:
             return redirect_to_login()
         
-        user = get_user_by_id(db=db, user_id=verified_user["user_id"])
+        user = await get_user_by_id(db=db, user_id=verified_user["user_id"])
     except:
         return redirect_to_login()
     
-    item = db.query(Project).filter(Project.id == item_id).filter(Project.user_id == user.id).first()
+    item = (await db.execute(
+        select(Project).filter(Project.id == item_id).filter(Project.user_id == user.id)
+    )).scalars().first()
     if item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
     else:
-        db.delete(item)
-        db.commit()
\ No newline at end of file
+        await db.delete(item)
+        with span("db_commit"):
+            await db.commit()
+        try:
+            IMAGE_INDEX.remove(image_file(item.image))
+        except InvalidImageKey:
+            pass # hiç indekslenmemiş bir yol
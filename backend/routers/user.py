@@ -12,9 +12,9 @@ from pydantic import BaseModel, Field
 from passlib.context import CryptContext
 from typing import Annotated
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from utils.database import SessionLocal, get_db
+from utils.database import get_read_db
 from utils.models import User, Base
 from utils.auth import *
 
@@ -34,7 +34,7 @@ templates = Jinja2Templates(directory=templates_directory)
 
 
 user_dependency = Annotated[dict, Depends(verify_token)]
-db_dependency = Annotated[Session, Depends(get_db)]
+db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
 
 
 @router.get("/profile",
@@ -51,15 +51,13 @@ async def get_user_profile(request: Request,
             - first_name
             - last_name
     """
-    print("get_user_profile")
     auth_header = request.headers.get("Authorization")
     token = auth_header.split(" ")[1]
-    print(token)
     verified_user = verify_token(token)
     if verified_user is None:
         return redirect_to_login()
     
-    user = get_user_by_id(db=db, user_id=verified_user["user_id"])
+    user = await get_user_by_id(db=db, user_id=verified_user["user_id"])
     if user is None:
         return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "User not found"})
     user_content = {
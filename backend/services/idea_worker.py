@@ -0,0 +1,94 @@
+"""
+Background workers for queued idea generation jobs.
+
+Workers run inside the API process (JOB_WORKERS asyncio tasks started by
+main.py) or as a separate process:
+
+    cd backend && python -m services.idea_worker --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import socket
+from typing import List
+
+from utils.geminiConnection import generate_ideas
+from utils.job_queue import JobQueue, get_job_queue
+from utils.logging_config import get_logger, request_id_var, setup_logging, shutdown_logging
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "2"))
+
+logger = get_logger(__name__)
+
+
+class IdeaWorker:
+    def __init__(self, queue: JobQueue, worker_id: str):
+        self.queue = queue
+        self.worker_id = worker_id
+
+    async def run_once(self) -> bool:
+        """Claim and run a single job. Returns False when the queue is empty."""
+        job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+        if job is None:
+            return False
+
+        # job'un log kayıtları job id ile ilişkilendirilir
+        request_id_var.set(f"job-{job['id']}")
+        try:
+            # job'lar hazır örnek fikirlerle tamamlanmaz, tekrar denenir
+            ideas = await generate_ideas(job["image_path"], allow_fallback=False, context_ideas=job["context"])
+            if ideas is None:
+                raise ValueError("Gemini did not return any ideas")
+            await asyncio.to_thread(self.queue.complete, job["id"], {"ideas": ideas})
+        except Exception as e:
+            logger.error("Idea job failed: %s", e, extra={"job_id": job["id"], "attempt": job["attempts"]})
+            # her denemede bekleme süresi ikiye katlanır
+            retry_delay = JOB_RETRY_DELAY * (2 ** (job["attempts"] - 1))
+            await asyncio.to_thread(self.queue.fail, job["id"], str(e), retry_delay)
+        return True
+
+    async def run(self):
+        # shutdown sırasında task iptal edilerek durdurulur
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Idea worker crashed while polling", extra={"worker_id": self.worker_id})
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+async def purge_expired_jobs(queue: JobQueue, interval: float = 60):
+    while True:
+        await asyncio.to_thread(queue.purge_expired)
+        await asyncio.sleep(interval)
+
+
+def start_workers(concurrency: int = JOB_WORKERS) -> List[asyncio.Task]:
+    """Start in-process workers on the running event loop."""
+    queue = get_job_queue()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    tasks = [
+        asyncio.create_task(IdeaWorker(queue, f"{prefix}-{i}").run())
+        for i in range(concurrency)
+    ]
+    tasks.append(asyncio.create_task(purge_expired_jobs(queue)))
+    return tasks
+
+
+async def main(concurrency: int):
+    tasks = start_workers(concurrency)
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run idea generation workers")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+    setup_logging()
+    try:
+        asyncio.run(main(args.concurrency))
+    finally:
+        shutdown_logging()
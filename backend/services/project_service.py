@@ -1,122 +1,149 @@
 """Service for handling project and roadmap operations."""
-import json
-import base64
-from typing import List, Dict, Optional
-from sqlalchemy.orm import Session
-from utils.models import Project, RoadmapStep, User
-from utils.gemini_service import GeminiService
+import asyncio
 import os
+import time
 import uuid
+from typing import Any, Iterable, List, Dict, Optional, Tuple
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.database import AsyncSessionLocal, SessionLocal
+from utils.models import Project, ProjectChange, RoadmapStep, User, InvalidImageKey, UPLOADS_DIR, image_file, image_key
+from utils.project_index import PROJECT_INDEX, project_text
+from utils.materials import MATERIAL_INDEX
+from utils.pagination import PAGE_SIZE_DEFAULT, decode_cursor, encode_cursor, decode_score_cursor, encode_score_cursor, decode_id_cursor, encode_id_cursor
+from utils.fulltext import search_public_projects
+from utils.gemini_service import GeminiService, FALLBACK_ROADMAP
+from utils.singleflight import SingleFlight
+from utils.logging_config import get_logger, span
+from dotenv import load_dotenv
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # services directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+logger = get_logger(__name__)
+
+# proje kaydedildikten sonra yol haritası arka planda üretilsin mi
+ROADMAP_PREGENERATE = os.getenv("ROADMAP_PREGENERATE", "true").lower() == "true"
+
+# item_hint ile benzer public projeler aranır: yeterince benzerse doğrudan döndürülür,
+# değilse Gemini'ye örnek olarak verilir
+PROJECT_RAG_TOP_K = int(os.getenv("PROJECT_RAG_TOP_K", "3"))
+PROJECT_RAG_MIN_SCORE = float(os.getenv("PROJECT_RAG_MIN_SCORE", "0.2"))
+PROJECT_RAG_DIRECT_SCORE = float(os.getenv("PROJECT_RAG_DIRECT_SCORE", "0.8"))
+
+# bellek içi indeksler project_change günlüğünden güncellenir; henüz commit edilmemiş bir
+# transaction'ın atladığı id'ler (PostgreSQL) bu kadar saniye tekrar sorulur
+INDEX_SYNC_GAP_TIMEOUT = float(os.getenv("INDEX_SYNC_GAP_TIMEOUT", "300"))
+INDEX_SYNC_BATCH = 1000
+
+# aynı proje için eşzamanlı ilk görüntülemeler tek bir üretim + kayıt işlemini paylaşır
+ROADMAP_STORE_SINGLE_FLIGHT = SingleFlight("roadmap-store")
+
+
+def _read_image(image_path: str) -> bytes:
+    with open(image_file(image_path), "rb") as f:
+        return f.read()
+
 
 class ProjectService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.gemini_service = GeminiService()
-        
+
     def _save_image(self, image_data: bytes) -> str:
         """Save image to disk and return the filename."""
-        print("[DEBUG] Starting image save process...")
         try:
             # Create uploads directory if it doesn't exist
-            upload_dir = "static/uploads"
-            os.makedirs(upload_dir, exist_ok=True)
-            
+            os.makedirs(UPLOADS_DIR, exist_ok=True)
+
             # Generate unique filename
             filename = f"{uuid.uuid4()}.jpg"
-            filepath = f"{upload_dir}/{filename}"
-            
-            print(f"[DEBUG] Saving image to {filepath}")
+            filepath = os.path.join(UPLOADS_DIR, filename)
+
             # Save file
-            with open(filepath, "wb") as f:
+            with span("upload_write"), open(filepath, "wb") as f:
                 f.write(image_data)
-                
-            print("[DEBUG] Image saved successfully")
-            return filepath  # Return path relative to the application root
-            
+
+            return filepath
+
         except Exception as e:
-            print(f"[ERROR] Failed to save image: {str(e)}")
+            logger.error("Failed to save image: %s", e)
             raise ValueError(f"Failed to save image: {str(e)}")
 
+    def _add_roadmap_steps(self, project_id: int, roadmap_steps: List[Dict]) -> None:
+        for step in roadmap_steps:
+            self.db.add(RoadmapStep(
+                project_id=project_id,
+                step_number=step["step_number"],
+                title=step["title"],
+                description=step["description"],
+                estimated_time=step["estimated_time"],
+                materials_needed=step["materials_needed"]
+            ))
+
     async def create_project_with_roadmap(
-        self, 
+        self,
         user_id: int,
-        name: str,
+        title: str,
         description: str,
         image_data: bytes
     ) -> Project:
         """Create a new project and generate its roadmap."""
-        print(f"[DEBUG] Starting project creation for user {user_id}...")
         try:
             # Validate input parameters
             if not user_id or not isinstance(user_id, int):
                 raise ValueError("Invalid user_id")
-            if not name or not isinstance(name, str):
-                raise ValueError("Invalid project name")
+            if not title or not isinstance(title, str):
+                raise ValueError("Invalid project title")
             if not description or not isinstance(description, str):
                 raise ValueError("Invalid project description")
             if not image_data or not isinstance(image_data, bytes):
                 raise ValueError("Invalid image data")
-                
+
             # Save image to disk
-            print("[DEBUG] Saving project image...")
             image_path = self._save_image(image_data)
-            
+
             # Create project
-            print("[DEBUG] Creating project record...")
             project = Project(
-                name=name,
+                title=title,
                 description=description,
-                image=image_path,
-                user_id=user_id
+                image=image_key(image_path),
+                user_id=user_id,
             )
             self.db.add(project)
-            self.db.flush()  # Get project ID without committing
-            print(f"[DEBUG] Project record created with ID: {project.id}")
+            await self.db.flush()  # Get project ID without committing
 
-            # Generate roadmap using Gemini
-            print("[DEBUG] Generating project roadmap...")
+            # Generate roadmap using Gemini, a failed generation is retried lazily on first view
             roadmap_steps = await self.gemini_service.generate_roadmap(
                 image_data=image_data,
-                project_name=name,
-                description=description
+                project_name=title,
+                description=description,
+                allow_fallback=False
             )
+            if roadmap_steps:
+                self._add_roadmap_steps(project.id, roadmap_steps)
 
-            # Create roadmap steps
-            print("[DEBUG] Creating roadmap steps...")
-            for step in roadmap_steps:
-                try:
-                    db_step = RoadmapStep(
-                        project_id=project.id,
-                        step_number=step["step_number"],
-                        title=step["title"],
-                        description=step["description"],
-                        estimated_time=step["estimated_time"],
-                        materials_needed=step["materials_needed"]
-                    )
-                    self.db.add(db_step)
-                except Exception as step_error:
-                    print(f"[ERROR] Failed to create roadmap step: {str(step_error)}")
-                    raise ValueError(f"Failed to create roadmap step: {str(step_error)}")
-
-            print("[DEBUG] Committing transaction...")
-            self.db.commit()
-            print(f"[DEBUG] Project creation completed successfully. Project ID: {project.id}")
+            with span("db_commit"):
+                await self.db.commit()
+            logger.info("Project created", extra={"project_id": project.id, "user_id": user_id})
             return project
 
         except Exception as e:
-            print(f"[ERROR] Project creation failed: {str(e)}")
-            self.db.rollback()
+            logger.error("Project creation failed: %s", e)
+            await self.db.rollback()
             raise ValueError(f"Project creation failed: {str(e)}")
 
-    def get_project_roadmap(self, project_id: int) -> List[Dict]:
-        """Get the roadmap steps for a project."""
-        steps = (
-            self.db.query(RoadmapStep)
+    async def get_project_roadmap(self, project_id: int) -> List[Dict]:
+        """Get the stored roadmap steps for a project (served by ix_roadmap_step_project_step)."""
+        steps = (await self.db.execute(
+            select(RoadmapStep)
             .filter(RoadmapStep.project_id == project_id)
             .order_by(RoadmapStep.step_number)
-            .all()
-        )
-        
+        )).scalars().all()
+
         return [
             {
                 "id": step.id,
@@ -128,52 +155,185 @@ class ProjectService:
             }
             for step in steps
         ]
-    
-    def get_user_projects(self, user_id: int) -> List[Dict]:
+
+    async def ensure_project_roadmap(self, project: Project) -> Optional[List[Dict]]:
+        """
+        Stored roadmap of a project, generating and storing it on first use.
+
+        Returns None when Gemini could not generate it; nothing is stored then so
+        the next request tries again.
+        """
+        steps = await self.get_project_roadmap(project.id)
+        if steps:
+            return steps
+        stored = await ROADMAP_STORE_SINGLE_FLIGHT.do(
+            project.id, self._generate_and_store_roadmap, project.id, project.image, project.title, project.description
+        )
+        if not stored:
+            return None
+        # single-flight sonucu başka bir session'da yazılmış olabilir, yeni sorgu onu da görür
+        return await self.get_project_roadmap(project.id)
+
+    async def _generate_and_store_roadmap(self, project_id: int, image_path: str, title: str, description: str) -> bool:
+        try:
+            image_data = await asyncio.to_thread(_read_image, image_path)
+        except (OSError, InvalidImageKey) as e:
+            logger.error("Could not read project image %s: %s", image_path, e)
+            return False
+
+        roadmap_steps = await self.gemini_service.generate_roadmap(
+            image_data=image_data,
+            project_name=title,
+            description=description,
+            allow_fallback=False
+        )
+        if not roadmap_steps:
+            return False
+
+        # üretim sırasında kayıt başka bir process tarafından yazılmış olabilir
+        if await self.get_project_roadmap(project_id):
+            return True
+        try:
+            self._add_roadmap_steps(project_id, roadmap_steps)
+            with span("db_commit"):
+                await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+        return True
+
+    async def find_similar_projects(self, query: str, k: int = PROJECT_RAG_TOP_K) -> List[Tuple[float, Dict]]:
+        """Public projects closest to query as (score, idea) pairs, best first."""
+        await INDEX_SYNC.refresh(self.db)
+        # arama CPU'da çalışır, event loop'u bloklamasın
+        found = await asyncio.to_thread(PROJECT_INDEX.search, query, k)
+        matches = [(score, project_id) for score, project_id in found if score >= PROJECT_RAG_MIN_SCORE]
+        if not matches:
+            return []
+        projects = {
+            project.id: project
+            for project in (await self.db.execute(
+                select(Project)
+                .filter(Project.id.in_([project_id for _, project_id in matches]))
+                .filter(Project.is_public == True)
+            )).scalars()
+        }
+        results = []
+        for score, project_id in matches:
+            project = projects.get(project_id)
+            if project is None:
+                continue # indeks veritabanının gerisinde kalmış olabilir
+            results.append((score, {
+                "title": project.title,
+                "description": project.description,
+                "materials": project.materials,
+                "roadmap": project.roadmap,
+            }))
+        return results
+
+    async def list_public_projects(self, limit: int = PAGE_SIZE_DEFAULT, cursor: Optional[str] = None) -> Tuple[List[Project], Optional[str]]:
+        """
+        One page of public projects, newest first, and the cursor of the next page.
+
+        Keyset pagination on (created_at, id) served by ix_project_public_created;
+        raises InvalidCursor for a cursor that was not produced here.
+        """
+        query = select(Project).filter(Project.is_public == True)
+        after = decode_cursor(cursor)
+        if after is not None:
+            query = query.filter(tuple_(Project.created_at, Project.id) < after)
+        # bir fazlası okunur, sonraki sayfa var mı anlaşılsın diye
+        query = query.order_by(Project.created_at.desc(), Project.id.desc()).limit(limit + 1)
+        projects = list((await self.db.execute(query)).scalars())
+
+        next_cursor = None
+        if len(projects) > limit:
+            projects = projects[:limit]
+            next_cursor = encode_cursor(projects[-1].created_at, projects[-1].id)
+        return projects, next_cursor
+
+    async def list_buildable_projects(self, materials: List[str], limit: int = PAGE_SIZE_DEFAULT, cursor: Optional[str] = None) -> Tuple[List[Project], Optional[str], Dict]:
+        """
+        One page of public projects that need nothing outside materials, newest first,
+        the cursor of the next page and {"materials", "total", "facets"} from MATERIAL_INDEX.
+        """
+        await INDEX_SYNC.refresh(self.db)
+        match = MATERIAL_INDEX.buildable(materials, limit + 1, before=decode_id_cursor(cursor))
+        page_ids = match.pop("project_ids")
+
+        next_cursor = None
+        if len(page_ids) > limit:
+            page_ids = page_ids[:limit]
+            next_cursor = encode_id_cursor(page_ids[-1])
+        projects = {
+            project.id: project
+            for project in (await self.db.execute(
+                select(Project).filter(Project.id.in_(page_ids)).filter(Project.is_public == True)
+            )).scalars()
+        } if page_ids else {}
+        return [projects[project_id] for project_id in page_ids if project_id in projects], next_cursor, match
+
+    async def search_public_projects(self, keyword: str, limit: int = PAGE_SIZE_DEFAULT, cursor: Optional[str] = None) -> Tuple[List[Tuple[Project, str]], Optional[str]]:
+        """
+        One page of (project, highlighted snippet) pairs matching keyword, best match first,
+        and the cursor of the next page. Raises InvalidCursor like list_public_projects.
+        """
+        with span("search"):
+            hits = await search_public_projects(self.db, keyword, limit + 1, decode_score_cursor(cursor))
+
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_score_cursor(hits[-1].score, hits[-1].project_id)
+        if not hits:
+            return [], None
+
+        projects = {
+            project.id: project
+            for project in (await self.db.execute(
+                select(Project).filter(Project.id.in_([hit.project_id for hit in hits]))
+            )).scalars()
+        }
+        # arama indeksi ile tablo arasında silinmiş satır kalmış olabilir
+        return [(projects[hit.project_id], hit.snippet) for hit in hits if hit.project_id in projects], next_cursor
+
+    async def get_user_projects(self, user_id: int) -> List[Dict]:
         """Get all projects for a user."""
-        projects = (
-            self.db.query(Project)
+        projects = (await self.db.execute(
+            select(Project)
             .filter(Project.user_id == user_id)
             .order_by(Project.created_at.desc())
-            .all()
-        )
-        
+        )).scalars().all()
+
         return [
             {
                 "id": project.id,
-                "name": project.name,
+                "title": project.title,
                 "description": project.description,
                 "image": project.image
             }
             for project in projects
         ]
-        
-    def get_project_details(self, project_id: int) -> Optional[Dict]:
+
+    async def get_project_details(self, project_id: int) -> Optional[Dict]:
         """Get details for a specific project."""
-        project = (
-            self.db.query(Project)
-            .filter(Project.id == project_id)
-            .first()
-        )
-        
+        project = await self.db.get(Project, project_id)
+
         if not project:
             return None
-            
+
         # Get the roadmap steps
-        steps = self.get_project_roadmap(project_id)
-        
+        steps = await self.get_project_roadmap(project_id)
+
         # Get the user (owner)
-        user = self.db.query(User).filter(User.id == project.user_id).first()
-        
+        user = await self.db.get(User, project.user_id)
+
         return {
             "id": project.id,
-            "name": project.name,
+            "title": project.title,
             "description": project.description,
             "image": project.image,
             "user_id": project.user_id,
             "created_at": project.created_at.isoformat(),
-            "updated_at": project.updated_at.isoformat(),
-            "done": project.done,
             "is_public": project.is_public,
             "roadmap": steps,
             "user": {
@@ -181,3 +341,128 @@ class ProjectService:
                 "id": user.id if user else None
             }
         }
+
+
+async def generate_project_roadmap(project_id: int) -> None:
+    """Background task run after /project/save-idea, uses its own session."""
+    async with AsyncSessionLocal() as db:
+        try:
+            project = await db.get(Project, project_id)
+            if project is None:
+                return
+            steps = await ProjectService(db).ensure_project_roadmap(project)
+            if steps is None:
+                logger.warning("Roadmap could not be generated, will retry on first view", extra={"project_id": project_id})
+        except Exception as e:
+            logger.exception("Background roadmap generation failed", extra={"project_id": project_id})
+
+
+class IndexSync:
+    """
+    Keeps this worker's in-memory PROJECT_INDEX and MATERIAL_INDEX in step with
+    the database.
+
+    Database triggers append the id of every inserted, edited or deleted
+    project to project_change (migration 0006). load() fills the indexes at
+    startup; refresh(db) runs before the index is queried and re-reads only the
+    projects changed since the last change applied, so every worker sees every
+    write whichever worker made it. Ids skipped by a transaction that commits
+    later (PostgreSQL hands out sequence values before commit) are asked for
+    again until INDEX_SYNC_GAP_TIMEOUT. A worker that falls behind the pruned
+    log loads everything again.
+    """
+
+    def __init__(self):
+        self.last_change = 0
+        self._gaps: Dict[int, float] = {} # atlanan change id -> ilk görüldüğü an
+        self._lock = asyncio.Lock()
+        self._counters = {"refreshes": 0, "changes": 0, "loads": 0}
+
+    def _track(self, change_ids: Iterable[int]) -> None:
+        """Advance last_change over the given ascending ids, remembering the skipped ones."""
+        now = time.monotonic()
+        for change_id in change_ids:
+            if change_id > self.last_change:
+                for missing in range(max(self.last_change + 1, change_id - INDEX_SYNC_BATCH), change_id):
+                    self._gaps.setdefault(missing, now)
+                self.last_change = change_id
+            self._gaps.pop(change_id, None)
+
+    @staticmethod
+    def _apply(project_ids: Iterable[int], rows: Iterable[Any]) -> None:
+        missing = set(project_ids)
+        for row in rows:
+            missing.discard(row.id)
+            PROJECT_INDEX.upsert(row.id, project_text(row.title, row.description, row.materials), bool(row.is_public))
+            MATERIAL_INDEX.upsert(row.id, row.materials, bool(row.is_public))
+        for project_id in missing:
+            # silinmiş
+            PROJECT_INDEX.remove(project_id)
+            MATERIAL_INDEX.remove(project_id)
+
+    def load(self) -> int:
+        """Fill both indexes from the project table. Returns rows indexed."""
+        db = SessionLocal()
+        try:
+            oldest, last_change = db.query(func.min(ProjectChange.id), func.max(ProjectChange.id)).one()
+            start = max((last_change or 0) - INDEX_SYNC_BATCH, (oldest or 1) - 1)
+            # son id'lerden görünmeyenler henüz commit edilmemiş olabilir, boşluk olarak takip edilir
+            recent = [
+                change_id for (change_id,) in db.query(ProjectChange.id)
+                .filter(ProjectChange.id > start)
+                .order_by(ProjectChange.id)
+            ]
+            # iki indeks aynı satırlardan kurulur
+            rows = db.query(Project.id, Project.title, Project.description, Project.materials, Project.is_public).all()
+            count = PROJECT_INDEX.rebuild(
+                (row.id, project_text(row.title, row.description, row.materials), bool(row.is_public)) for row in rows
+            )
+            MATERIAL_INDEX.rebuild((row.id, row.materials, bool(row.is_public)) for row in rows)
+        finally:
+            db.close()
+        self.last_change = start
+        self._gaps.clear()
+        self._track(recent)
+        self._counters["loads"] += 1
+        return count
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Apply the changes logged since the last refresh. Returns changes applied."""
+        async with self._lock:
+            now = time.monotonic()
+            self._gaps = {change_id: seen for change_id, seen in self._gaps.items() if now - seen < INDEX_SYNC_GAP_TIMEOUT}
+            condition = ProjectChange.id > self.last_change
+            if self._gaps:
+                condition = or_(condition, ProjectChange.id.in_(list(self._gaps)))
+            changes = (await db.execute(
+                select(ProjectChange.id, ProjectChange.project_id).filter(condition).order_by(ProjectChange.id)
+            )).all()
+            self._counters["refreshes"] += 1
+            if not changes:
+                return 0
+
+            oldest = (await db.execute(select(func.min(ProjectChange.id)))).scalar()
+            if oldest > self.last_change + 1 and changes[0].id > self.last_change:
+                # aradaki değişiklikler günlükten silinmiş
+                logger.warning("Project change log pruned past this worker, reloading indexes", extra={"last_change": self.last_change})
+                await asyncio.to_thread(self.load)
+                return len(changes)
+
+            project_ids = sorted({change.project_id for change in changes})
+            rows = []
+            for start in range(0, len(project_ids), INDEX_SYNC_BATCH):
+                batch = project_ids[start:start + INDEX_SYNC_BATCH]
+                rows.extend((await db.execute(
+                    select(Project.id, Project.title, Project.description, Project.materials, Project.is_public)
+                    .filter(Project.id.in_(batch))
+                )).all())
+            await asyncio.to_thread(self._apply, project_ids, rows)
+            self._track(change.id for change in changes)
+            self._counters["changes"] += len(changes)
+            return len(changes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "last_change": self.last_change, "gaps": len(self._gaps)}
+
+
+INDEX_SYNC = IndexSync()
@@ -0,0 +1,69 @@
+"""
+Copies the primary SQLite database to the read replicas for local testing.
+
+PostgreSQL replicas are kept up to date by streaming replication on the
+server side; this tool only handles DATABASE_REPLICA_URLS that point to SQLite
+files, using SQLite's online backup so the API can keep reading and writing
+while a copy is made. --interval simulates replication lag.
+
+    cd backend && python -m services.replica_sync --interval 2
+"""
+import argparse
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+from utils.database import DATABASE_REPLICA_URLS, SQLALCHAMY_DATABASE_URL, SQLITE_BUSY_TIMEOUT_MS
+from utils.logging_config import get_logger, setup_logging, shutdown_logging
+
+logger = get_logger(__name__)
+
+
+def sqlite_path(url: str):
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return parsed.database
+
+
+def sync_replicas(primary_path: str, replica_paths) -> None:
+    source = sqlite3.connect(primary_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        for replica_path in replica_paths:
+            started = time.perf_counter()
+            target = sqlite3.connect(replica_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            logger.info("Replica synced", extra={"replica": replica_path, "ms": round((time.perf_counter() - started) * 1000, 1)})
+    finally:
+        source.close()
+
+
+def main(interval: float, once: bool) -> None:
+    primary_path = sqlite_path(SQLALCHAMY_DATABASE_URL)
+    replica_paths = [path for path in map(sqlite_path, DATABASE_REPLICA_URLS) if path]
+    if primary_path is None or not replica_paths:
+        logger.warning("Nothing to sync, primary and DATABASE_REPLICA_URLS must be SQLite files")
+        return
+    while True:
+        sync_replicas(primary_path, replica_paths)
+        if once:
+            return
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the primary SQLite database to its replicas")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between copies")
+    parser.add_argument("--once", action="store_true", help="copy once and exit")
+    args = parser.parse_args()
+    setup_logging()
+    try:
+        main(args.interval, args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_logging()
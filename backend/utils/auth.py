@@ -1,5 +1,8 @@
 from datetime import timedelta, datetime, timezone
 from pathlib import Path
+import asyncio
+import hashlib
+import hmac
 
 from fastapi import Depends, HTTPException
 from pydantic import BaseModel, Field
@@ -7,8 +10,9 @@ from starlette import status
 from fastapi.security import OAuth2PasswordBearer
 from utils.models import User
 from passlib.context import CryptContext
-from typing import Annotated
-from sqlalchemy.orm import Session
+from typing import Annotated, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 from fastapi.responses import RedirectResponse
 import os
@@ -41,14 +45,15 @@ class Token(BaseModel):
     token_type: str
 
 
-def authenticate_user(db: Session, 
+async def authenticate_user(db: AsyncSession, 
                       username: str, 
                       password: str):
-    user = db.query(User).filter(User.username == username).first()
+    user = (await db.execute(select(User).filter(User.username == username))).scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
                              detail="Invalid credentials")
-    if not bcrypt_context.verify(password, user.hashed_password):
+    # bcrypt kasıtlı olarak yavaş, event loop'u bloklamasın
+    if not await asyncio.to_thread(bcrypt_context.verify, password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
                              detail="Invalid credentials")
     return user
@@ -62,6 +67,28 @@ def create_access_token(username:str, user_id:int, expire_time:timedelta):
     return encoded_jwt
 
 
+def sign_last_write(at: float) -> str:
+    """Signed "<timestamp>.<signature>" value of the last-write cookie/header (see utils.database)."""
+    timestamp = f"{at:.3f}"
+    signature = hmac.new(JWT_SECRET_KEY.encode(), timestamp.encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}.{signature}"
+
+
+def last_write_at(value: Optional[str]) -> Optional[float]:
+    """Timestamp of a value made by sign_last_write, None if missing or forged (no error)."""
+    # "<saniye>.<ms>.<imza>", imza son noktadan sonra
+    timestamp, _, signature = (value or "").rpartition(".")
+    if not timestamp or not signature:
+        return None
+    expected = hmac.new(JWT_SECRET_KEY.encode(), timestamp.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        return None
+    try:
+        return float(timestamp)
+    except ValueError:
+        return None
+
+
 def verify_token(token: Annotated[str, Depends(oauth_bearer)]):
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
@@ -83,8 +110,8 @@ def redirect_to_login():
     return redirect_response
 
 
-def get_user_by_id(db: Session, user_id: int):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="User not found")
@@ -1,8 +1,20 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from collections import deque
+from contextvars import ContextVar
+from itertools import cycle
+from typing import Any, Dict, Optional
 import os
+import threading
+import time
+import orjson
 from dotenv import load_dotenv
+from fastapi import Request
 
 
 current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory, routers
@@ -13,19 +25,307 @@ environment_path = backend_directory + "/.env"
 load_dotenv(environment_path)
 
 SQLALCHAMY_DATABASE_URL = os.getenv("SQLALCHAMY_DATABASE_URL")
+# açılışta alembic upgrade head çalıştırılır
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
 
-engine = create_engine(
-    SQLALCHAMY_DATABASE_URL, connect_args={'check_same_thread': False}
-)
+# bağlantı havuzu, worker (process) başına; PostgreSQL'de toplam bağlantı = worker sayısı * (size + overflow)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30")) # saniye, boş bağlantı için en fazla bekleme
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # saniye, sunucu tarafında kapanan bağlantılar için
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000")) # PostgreSQL, 0 ise sınırsız
+
+# SQLite: WAL okuyucuların yazarı beklemesini önler, busy_timeout "database is locked" yerine bekletir
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))) # byte
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536")) # negatifse KiB (64 MB), pozitifse sayfa
+
+# okuma replikaları, virgülle ayrılmış; boşsa tüm okumalar primary'den yapılır
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# yazan kullanıcının okumaları bu kadar saniye primary'ye gider (replikasyon gecikmesi)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# yazma yapan isteğin yanıtına eklenir, istemci sonraki isteklerde geri gönderir
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+# API istekleri async engine kullanır; sync engine migration'lar ve komut satırı araçları için
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+POOL_WAIT_SAMPLES = 2048
+
+
+def async_database_url(url: str) -> str:
+    """Same database through its asyncio driver (sqlite -> aiosqlite, postgresql -> asyncpg)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.drivername in ASYNC_DRIVERS.values():
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHAMY_DATABASE_URL)
+
+
+def sqlite_pragmas() -> list:
+    for name, value in (("SQLITE_JOURNAL_MODE", SQLITE_JOURNAL_MODE), ("SQLITE_SYNCHRONOUS", SQLITE_SYNCHRONOUS)):
+        if not value.isalpha():
+            raise ValueError(f"{name} must be a plain keyword, got {value!r}")
+    return [
+        f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+    ]
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # her yeni bağlantıda; journal_mode dosyada kalıcıdır, diğerleri bağlantıya özeldir
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+class PoolMetrics:
+    """Checkout counters and wait times of one engine's pool, plus its current saturation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=POOL_WAIT_SAMPLES) # ms, son checkout'lar
+        self._counters = {"checkouts": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_ms": 0.0, "peak_checked_out": 0}
+
+    def observe(self, seconds: float, checked_out: int, timed_out: bool = False) -> None:
+        with self._lock:
+            self._waits.append(seconds * 1000)
+            self._counters["checkouts"] += 1
+            self._counters["timeouts"] += int(timed_out)
+            self._counters["wait_seconds"] += seconds
+            self._counters["max_wait_ms"] = max(self._counters["max_wait_ms"], seconds * 1000)
+            self._counters["peak_checked_out"] = max(self._counters["peak_checked_out"], checked_out)
+
+    def stats(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            waits = sorted(self._waits)
+        result = {**counters, "pool": type(pool).__name__}
+        result["wait_seconds"] = round(counters["wait_seconds"], 3)
+        result["max_wait_ms"] = round(counters["max_wait_ms"], 2)
+        if waits:
+            result["wait_p50_ms"] = round(waits[len(waits) // 2], 2)
+            result["wait_p99_ms"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.99))], 2)
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            result.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+            })
+        return result
+
+
+class _TimedPool:
+    metrics: PoolMetrics
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            self.metrics.observe(time.perf_counter() - started, self.checkedout(), timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - started, self.checkedout())
+        return connection
+
+
+def timed_pool(pool_class, metrics: PoolMetrics):
+    # metrics sınıf özelliği olarak tutulur, dispose() sonrası recreate() aynı sınıfı kurar
+    return type(f"Timed{pool_class.__name__}", (_TimedPool, pool_class), {"metrics": metrics})
+
+
+def engine_options(url: str, metrics: PoolMetrics) -> Dict[str, Any]:
+    parsed = make_url(url)
+    is_async = parsed.drivername in ASYNC_DRIVERS.values()
+    # JSON kolonları (materials, roadmap) okunurken orjson ile çözülür
+    options: Dict[str, Any] = {"json_deserializer": orjson.loads}
+    if parsed.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options # bellek içi veritabanı tek bağlantıyla çalışır, havuz ayarı yok
+    else:
+        options.update(pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE)
+        if parsed.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0:
+            if is_async:
+                options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+            else:
+                options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    options.update(
+        poolclass=timed_pool(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+# /metrics/database için isim -> (engine, PoolMetrics)
+DATABASE_POOLS: Dict[str, tuple] = {}
+
+
+def _register(name: str, url: str, factory):
+    metrics = PoolMetrics(name)
+    new_engine = factory(url, **engine_options(url, metrics))
+    if new_engine.dialect.name == "sqlite":
+        event.listen(getattr(new_engine, "sync_engine", new_engine), "connect", _set_sqlite_pragmas)
+    DATABASE_POOLS[name] = (new_engine, metrics)
+    return new_engine
+
+
+# isteğin commit ettiği son yazmanın zamanı, ReadYourWritesMiddleware yanıta ekler
+last_write_var: ContextVar[Optional[Dict[str, float]]] = ContextVar("last_write", default=None)
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware handing the client a signed timestamp of its last write.
+
+    When a request commits a write on the primary, its response carries a
+    last_write cookie and an X-Last-Write header ("<timestamp>.<signature>",
+    see utils.auth.sign_last_write). get_read_db sends the following reads of
+    a client that returns either one to the primary for READ_YOUR_WRITES_SECONDS,
+    whichever worker serves them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        from utils.auth import sign_last_write # utils.auth -> utils.models -> utils.database
+
+        writes: Dict[str, float] = {}
+        token = last_write_var.set(writes)
+
+        async def send_with_last_write(message):
+            if message["type"] == "http.response.start" and "at" in writes:
+                value = sign_last_write(writes["at"])
+                cookie = f"{LAST_WRITE_COOKIE}={value}; Max-Age={max(int(READ_YOUR_WRITES_SECONDS), 1)}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode("latin-1")),
+                    (LAST_WRITE_HEADER.lower().encode(), value.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_last_write)
+        finally:
+            last_write_var.reset(token)
+
+
+class PrimarySession(Session):
+    pass
+
+
+class ReplicaSession(Session):
+    pass
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _remember_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_writer(session):
+    # ORM flush'u olan commit'ler; istek dışında (arka plan, job) sözlük yoktur
+    writes = last_write_var.get()
+    if session.info.pop("wrote", False) and writes is not None:
+        writes["at"] = time.time()
+
+
+@event.listens_for(ReplicaSession, "before_flush")
+def _reject_replica_write(session, flush_context, instances):
+    raise RuntimeError("Replica sessions are read-only, use get_db for writes")
+
+
+engine = _register("sync", SQLALCHAMY_DATABASE_URL, create_engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = _register("async", ASYNC_DATABASE_URL, create_async_engine)
+# commit sonrası nesneler yeniden yüklenmez, async'te lazy load yapılamaz
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, sync_session_class=PrimarySession, autoflush=False, expire_on_commit=False
+)
+
+replica_engines = [
+    _register(f"replica{number}", async_database_url(url), create_async_engine)
+    for number, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+]
+ReplicaSessionLocals = [
+    async_sessionmaker(replica, class_=AsyncSession, sync_session_class=ReplicaSession, autoflush=False, expire_on_commit=False)
+    for replica in replica_engines
+]
+_next_replica = cycle(ReplicaSessionLocals)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def pool_stats() -> Dict[str, Any]:
+    return {name: metrics.stats(pool_engine.pool) for name, (pool_engine, metrics) in DATABASE_POOLS.items()}
+
+def run_migrations():
+    """Bring the database schema to the latest migration (alembic upgrade head)."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(backend_directory, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(backend_directory, "migrations"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+def _recent_writer(request: Request) -> bool:
+    from utils.auth import last_write_at # utils.auth -> utils.models -> utils.database
+
+    at = last_write_at(request.cookies.get(LAST_WRITE_COOKIE) or request.headers.get(LAST_WRITE_HEADER))
+    return at is not None and time.time() - at < READ_YOUR_WRITES_SECONDS
+
+async def close_engines():
+    await async_engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+
+async def get_db():
+    """Session on the primary, for requests that write (or must see the latest data)."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+async def get_read_db(request: Request):
+    """
+    Read-only session for list endpoints: a replica (round robin) when any is
+    configured, the primary when none is or the client sent a last write
+    (ReadYourWritesMiddleware) from the last READ_YOUR_WRITES_SECONDS.
+    """
+    recent_writer = _recent_writer(request)
+    if not ReplicaSessionLocals or recent_writer:
+        async with AsyncSessionLocal() as db:
+            # yanıt önbelleği bu kullanıcı için atlanır, kendi değişikliğini hemen görür
+            db.info["recent_writer"] = recent_writer
+            yield db
+        return
+    async with read_session() as db:
+        yield db
 
+def read_session() -> AsyncSession:
+    """New read-only session outside a request (a replica when configured, else the primary)."""
+    return next(_next_replica)() if ReplicaSessionLocals else AsyncSessionLocal()
@@ -0,0 +1,178 @@
+"""
+Read-through cache for the public explore feed and search results.
+
+Cached values are rendered JSON bodies keyed by endpoint and query
+parameters. Every entry carries the cache version it was loaded under:
+
+- fresh for EXPLORE_CACHE_TTL seconds: served as is
+- stale for EXPLORE_CACHE_STALE more seconds: served as is while one
+  background load refreshes it (stale-while-revalidate); across workers
+  only the holder of a short lease refreshes a given key
+- from an older version: never served, loaded again
+
+The version is the "explore" row of cache_version in the primary database.
+Triggers bump it in the same transaction whenever a project becomes public
+or private or a public project is inserted or deleted (migration 0007), so
+every entry of the previous public set disappears at once in every worker,
+whichever worker or script made the write. Each lookup reads it with one
+primary key query; other edits of public projects show up within the TTL.
+Concurrent misses of the same key share one load (SingleFlight) instead of
+all hitting the database when a version changes or an entry expires.
+
+- memory tier: LRU, per worker
+- shared tier: SQLite file, enabled when EXPLORE_CACHE_PATH is set, shared by
+  all workers on the host (the local stand-in for a shared cache server);
+  its reads and writes run in a thread
+
+With read replicas, a load right after a version change may still see the
+old data, so nothing is stored for READ_YOUR_WRITES_SECONDS after this
+worker first sees one.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from utils.cache import LRUCache, SQLiteCache
+from utils.database import AsyncSessionLocal, DATABASE_REPLICA_URLS, READ_YOUR_WRITES_SECONDS, read_session
+from utils.logging_config import get_logger
+from utils.models import CacheVersion
+from utils.singleflight import SingleFlight
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+EXPLORE_CACHE_SIZE = int(os.getenv("EXPLORE_CACHE_SIZE", "1024"))
+EXPLORE_CACHE_TTL = float(os.getenv("EXPLORE_CACHE_TTL", "30")) # saniye, taze
+EXPLORE_CACHE_STALE = float(os.getenv("EXPLORE_CACHE_STALE", "300")) # saniye, arka planda yenilenirken sunulur
+EXPLORE_CACHE_PATH = os.getenv("EXPLORE_CACHE_PATH")
+EXPLORE_CACHE_LEASE = float(os.getenv("EXPLORE_CACHE_LEASE", "10")) # saniye, bir anahtarı yenileyen worker'ın kilidi
+
+VERSION_NAME = "explore" # cache_version satırı
+
+logger = get_logger(__name__)
+
+Loader = Callable[[Any], Awaitable[str]]
+
+
+class ExploreCache:
+    def __init__(self, max_size: int, ttl: float, stale: float, path: Optional[str] = None):
+        self.ttl = ttl
+        self.stale = stale
+        self.memory = LRUCache(max_size=max_size, ttl=ttl + stale)
+        self.shared = SQLiteCache(path, ttl=ttl + stale) if path else None
+        self._version: Optional[int] = None # son görülen, ilk okumada değişiklik sayılmaz
+        self._invalidated_at = 0.0
+        self._flight = SingleFlight("explore-cache")
+        self._refreshing = set() # arka plan görevleri, GC toplamasın diye
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "invalidations": 0, "not_stored": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    async def version(self) -> int:
+        """Current version from the primary, dropping this worker's entries of older ones."""
+        async with AsyncSessionLocal() as db:
+            version = (await db.execute(
+                select(CacheVersion.version).filter(CacheVersion.name == VERSION_NAME)
+            )).scalar() or 0
+        if version != self._version:
+            with self._lock:
+                changed = self._version is not None and version != self._version
+                self._version = version
+                if changed:
+                    self._invalidated_at = time.time()
+            if changed:
+                self.memory.clear()
+                self._count("invalidations")
+                logger.info("Explore cache version changed", extra={"version": version})
+                if self.shared is not None:
+                    # eski sürümlerin girdileri ve lease'ler
+                    self._in_background(asyncio.to_thread(self.shared.purge_expired))
+        return version
+
+    def _recently_invalidated(self) -> bool:
+        return bool(DATABASE_REPLICA_URLS) and time.time() - self._invalidated_at < READ_YOUR_WRITES_SECONDS
+
+    async def _lookup(self, key: str, version: int) -> Optional[Dict[str, Any]]:
+        entry = self.memory.get(key)
+        if (entry is None or entry["version"] != version) and self.shared is not None:
+            entry = await asyncio.to_thread(self.shared.get, key)
+            if entry is not None:
+                self.memory.set(key, entry, ttl=max(entry["stale_until"] - time.time(), 0)) # memory tier'a taşı
+        return entry
+
+    async def _store(self, key: str, body: str, version: int) -> None:
+        if self._recently_invalidated():
+            self._count("not_stored")
+            return
+        now = time.time()
+        entry = {"version": version, "fresh_until": now + self.ttl, "stale_until": now + self.ttl + self.stale, "body": body}
+        self.memory.set(key, entry)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set, key, entry)
+
+    async def _load(self, key: str, loader: Loader, version: int) -> str:
+        async with read_session() as db:
+            body = await loader(db)
+        await self._store(key, body, version)
+        return body
+
+    async def _refresh(self, key: str, loader: Loader, version: int) -> None:
+        if self.shared is not None and not await asyncio.to_thread(self.shared.add, f"lease:{version}:{key}", 1, EXPLORE_CACHE_LEASE):
+            return # başka bir worker yeniliyor
+        self._count("refreshes")
+        await self._flight.do(f"{version}:{key}", self._load, key, loader, version)
+
+    def _in_background(self, awaitable: Awaitable) -> None:
+        task = asyncio.ensure_future(awaitable)
+        self._refreshing.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Explore cache background task failed: %s", task.exception())
+
+    async def get_or_load(self, key: str, loader: Loader) -> str:
+        """
+        Cached JSON body for key, or loader(db) on a fresh read-only session.
+
+        Errors raised by loader (e.g. InvalidCursor) reach the caller and are not cached.
+        """
+        version = await self.version()
+        entry = await self._lookup(key, version)
+        if entry is not None and entry["version"] == version:
+            now = time.time()
+            if now < entry["fresh_until"]:
+                self._count("hits")
+                return entry["body"]
+            if now < entry["stale_until"]:
+                self._count("stale_hits")
+                self._in_background(self._refresh(key, loader, version))
+                return entry["body"]
+        self._count("misses")
+        return await self._flight.do(f"{version}:{key}", self._load, key, loader, version)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": round((counters["hits"] + counters["stale_hits"]) / lookups, 4) if lookups else 0.0,
+            "version": self._version,
+            "memory_entries": len(self.memory),
+            "shared_enabled": self.shared is not None,
+        }
+
+
+EXPLORE_CACHE = ExploreCache(EXPLORE_CACHE_SIZE, EXPLORE_CACHE_TTL, EXPLORE_CACHE_STALE, EXPLORE_CACHE_PATH or None)
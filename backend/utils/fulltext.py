@@ -0,0 +1,131 @@
+"""
+Keyword search over public projects with the database's own full-text engine.
+
+SQLite uses the FTS5 table project_fts ranked by bm25, PostgreSQL the
+project.search_vector column ranked by ts_rank_cd (both created by migration
+0004 and kept in sync by the database itself). Both ignore diacritics, so
+"sise" finds "şişe": FTS5 through its tokenizer, PostgreSQL through the
+project_search configuration of migration 0008. Scores are normalised so that a
+lower score is a better match, which lets both dialects page with the same
+(score, id) keyset.
+
+Snippets are safe HTML: the database marks matches with private-use sentinel
+characters, the text is escaped in Python and only then are the sentinels
+turned into <mark> tags.
+"""
+import html
+import re
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_TERM = re.compile(r"\w+")
+MAX_TERMS = 8
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# veritabanının işaretlediği yerler, kullanıcı metninde geçmeyen özel kullanım karakterleri
+_SENTINEL_START = "\ue000"
+_SENTINEL_END = "\ue001"
+_SENTINELS = re.compile(f"({_SENTINEL_START}|{_SENTINEL_END})")
+
+# title, description, materials ağırlıkları
+SQLITE_SEARCH = text("""
+WITH matches AS (
+    SELECT rowid AS id, bm25(project_fts, 10.0, 4.0, 2.0) AS score
+    FROM project_fts
+    WHERE project_fts MATCH :query
+)
+SELECT id, score FROM matches
+WHERE :after_score IS NULL OR score > :after_score OR (score = :after_score AND id > :after_id)
+ORDER BY score, id
+LIMIT :limit
+""")
+
+SQLITE_SNIPPETS = text("""
+SELECT rowid AS id, snippet(project_fts, -1, :start, :end, '…', 16) AS snippet
+FROM project_fts
+WHERE project_fts MATCH :query AND rowid IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+# headline yalnızca sayfadaki satırlar için hesaplanır; project_search = simple + unaccent
+POSTGRESQL_SEARCH = text("""
+WITH matches AS (
+    SELECT id, -ts_rank_cd(search_vector, to_tsquery('project_search', :query)) AS score
+    FROM project
+    WHERE is_public AND search_vector @@ to_tsquery('project_search', :query)
+), page AS (
+    SELECT id, score FROM matches
+    WHERE CAST(:after_score AS float8) IS NULL OR score > :after_score OR (score = :after_score AND id > :after_id)
+    ORDER BY score, id
+    LIMIT :limit
+)
+SELECT page.id, page.score,
+       ts_headline('project_search', concat_ws(' - ', project.title, project.description), to_tsquery('project_search', :query),
+                   'StartSel=' || CAST(:start AS text) || ', StopSel=' || CAST(:end AS text) || ', MaxWords=24, MinWords=8') AS snippet
+FROM page JOIN project ON project.id = page.id
+ORDER BY page.score, page.id
+""")
+
+
+class SearchHit(NamedTuple):
+    project_id: int
+    score: float
+    snippet: str
+
+
+def render_snippet(raw: str) -> str:
+    """HTML-escape a snippet and turn its sentinels into balanced <mark> tags."""
+    parts = []
+    marked = False
+    for part in _SENTINELS.split(raw or ""):
+        if part == _SENTINEL_START:
+            if not marked:
+                parts.append(HIGHLIGHT_START)
+            marked = True
+        elif part == _SENTINEL_END:
+            if marked:
+                parts.append(HIGHLIGHT_END)
+            marked = False
+        else:
+            parts.append(html.escape(part))
+    if marked:
+        parts.append(HIGHLIGHT_END)
+    return "".join(parts)
+
+
+def search_terms(keyword: str) -> List[str]:
+    """Words of the keyword; anything else is dropped so user input never reaches the query syntax."""
+    return _TERM.findall(keyword.lower())[:MAX_TERMS]
+
+
+def sqlite_query(terms: Sequence[str]) -> str:
+    # tüm kelimeler geçmeli, sonuncusu yazılırken de eşleşsin diye önek olarak aranır
+    return " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+
+
+def postgresql_query(terms: Sequence[str]) -> str:
+    return " & ".join(list(terms[:-1]) + [f"{terms[-1]}:*"])
+
+
+async def search_public_projects(db: AsyncSession, keyword: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[SearchHit]:
+    """Best matching public projects after the (score, id) key, best first."""
+    terms = search_terms(keyword)
+    if not terms:
+        return []
+    after_score, after_id = after if after is not None else (None, None)
+    params = {"limit": limit, "after_score": after_score, "after_id": after_id, "start": _SENTINEL_START, "end": _SENTINEL_END}
+
+    if db.get_bind().dialect.name == "postgresql":
+        rows = (await db.execute(POSTGRESQL_SEARCH, {**params, "query": postgresql_query(terms)})).fetchall()
+        return [SearchHit(row.id, float(row.score), render_snippet(row.snippet)) for row in rows]
+
+    query = sqlite_query(terms)
+    rows = (await db.execute(SQLITE_SEARCH, {**params, "query": query})).fetchall()
+    if not rows:
+        return []
+    snippets = dict((await db.execute(
+        SQLITE_SNIPPETS, {"query": query, "ids": [row.id for row in rows], "start": _SENTINEL_START, "end": _SENTINEL_END}
+    )).fetchall())
+    return [SearchHit(row.id, float(row.score), render_snippet(snippets.get(row.id, ""))) for row in rows]
@@ -1,30 +1,61 @@
 import os
-import base64
+import asyncio
+import hashlib
 import json
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import google.generativeai as generativeai
-import io
-import argparse
+
+from utils.idea_cache import IDEA_CACHE
+from utils.image_index import IMAGE_INDEX, NEAR_DUPLICATE_DISTANCE, NEAR_DUPLICATE_MODE
+from utils.llm_json import JSONArrayStreamParser, IdeaSchema, parse_ideas, validate_items
+from utils.singleflight import SingleFlight
+from utils.image_preprocess import IMAGE_PREPROCESSOR
+from utils.resilience import GEMINI_GUARD, GeminiUnavailable
+from utils.llm_provider import get_llm_provider
+from utils.logging_config import get_logger, log_payload, span
 
 environment_path = os.path.dirname(os.path.abspath(__file__)) + "/.env"
 load_dotenv(environment_path)
 
-API_KEY = os.getenv('GEMINI_API_KEY')
-if not API_KEY:
-    raise ValueError('GEMINI_API_KEY environment variable is not set')
+logger = get_logger(__name__)
 
-generativeai.configure(api_key=API_KEY) 
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '60'))
+# Gemini'ye ulaşılamadığında benzer görsel ya da hazır örnek fikirler döndürülür
+GEMINI_FALLBACK = os.getenv('GEMINI_FALLBACK', 'true').lower() == 'true'
+IDEA_SINGLE_FLIGHT = SingleFlight("ideas")
 
-MODEL = generativeai.GenerativeModel('gemini-2.0-flash' )
+FALLBACK_IDEAS = [
+    {
+        "title": "Kalemlik",
+        "description": "Kullanılmayan bardağı bir kalemliğe dönüştürün.",
+        "materials": ["Cam Boyası"],
+        "roadmap": [
+            "Bardağı temizleyin.",
+            "Cam boyası ile bardağı boyayın.",
+            "Bardak kuruduktan sonra kalemlerinizi yerleştirin."
+        ]
+    },
+    {
+        "title": "Gece Lambası",
+        "description": "Kullanılmayan bardağı gece lambası yapın.",
+        "materials": ["LED ışık", "Kablo", "Mukavva"],
+        "roadmap": [
+            "Bardağı temizleyin.",
+            "Mukavvadan bir taban kesin.",
+            "LED ışığını bardağa yerleştirin.",
+            "Mukavvayı bardağın altına yapıştırın.",
+            "LED ışığını bir güç kaynağına bağlayın.",
+            "Bardağı bir lamba olarak kullanın."
+        ]
+    }
+]
 
-CLIENT = genai.Client(api_key=API_KEY)
+# prompt değiştiğinde artırılmalı, eski cache kayıtları geçersiz olur
+PROMPT_VERSION = "1"
 
 
-def create_system_prompt():
+def create_system_prompt(context_ideas=None):
     """Create the system prompt for Gemini."""
-    return """
+    prompt = """
     You are an assistant that generates upcycling 3 DIY project ideas from an item image.
 
     Return your response strictly as a JSON array. Each element must have:
@@ -50,38 +81,215 @@ def create_system_prompt():
     Input will be an image of a recyclable item.
     Respond have to be only in the above JSON format.
     """
+    if context_ideas:
+        prompt += f"""
+    Ideas generated earlier for a very similar item are given below.
+    You can use them as inspiration but do not copy them:
+    {json.dumps(context_ideas, ensure_ascii=False)}
+    """
+    return prompt
 
 def load_image(image_path):
     with open(image_path, 'rb') as f:
       image_bytes = f.read()
     return image_bytes
 
-def process_image_with_gemini(image_path):
-    prompt = create_system_prompt()
+async def call_gemini(prompt, image, mime_type, config=None):
+    """
+    One provider call through GEMINI_GUARD (rate limit, adaptive concurrency
+    limit, circuit breaker), cancelled after GEMINI_TIMEOUT seconds.
+
+    image must already be preprocessed (IMAGE_PREPROCESSOR.process). Raises
+    GeminiUnavailable, asyncio.TimeoutError or the provider's error.
+    """
+    async with GEMINI_GUARD.attempt():
+        return await asyncio.wait_for(
+            get_llm_provider().generate(prompt, image, mime_type, config=config),
+            timeout=GEMINI_TIMEOUT
+        )
+
+def find_similar_ideas(image_path, max_distance=NEAR_DUPLICATE_DISTANCE):
+    """Return cached ideas of the closest near-duplicate upload, if there is one."""
+    for distance, similar_path, digest in IMAGE_INDEX.near_duplicates(image_path, max_distance):
+        ideas = IDEA_CACHE.get(f"{PROMPT_VERSION}:{digest}")
+        if ideas is not None:
+            return ideas
+    return None
+
+def _parse_ideas(raw_text, cache_key):
+    with span("parse"):
+        upcycling_ideas = parse_ideas(raw_text)
+    log_payload(logger, "Gemini idea response", raw_text)
+    if not upcycling_ideas:
+        logger.warning("Gemini did not return valid JSON", extra={"response_chars": len(raw_text)})
+        return None
+    IDEA_CACHE.set(cache_key, upcycling_ideas)
+    return upcycling_ideas
+
+def context_cache_key(cache_key, context_ideas=None):
+    """cache_key extended with a stable hash of the example ideas given in the prompt, if any."""
+    if not context_ideas:
+        return cache_key
+    context = json.dumps(context_ideas, sort_keys=True, ensure_ascii=False)
+    return f"{cache_key}:{hashlib.sha1(context.encode()).hexdigest()}"
+
+def _load_image_with_key(image_path, context_ideas=None):
     image = load_image(image_path)
+    return image, context_cache_key(IDEA_CACHE.key_for(image, PROMPT_VERSION), context_ideas)
+
+async def process_image_with_gemini_async(image_path, context_ideas=None):
+    """
+    Ideas for one uploaded image, from the cache or from Gemini.
+
+    Uses the provider's async API, so the event loop keeps serving other requests
+    while the model works. Calls go through call_gemini (GEMINI_GUARD and GEMINI_TIMEOUT).
+    """
+    prompt = create_system_prompt(context_ideas)
+    # dosya okuma ve sha256 hesabı event loop'u bloklamasın; örnek fikirler farklıysa prompt da farklıdır
+    image, cache_key = await asyncio.to_thread(_load_image_with_key, image_path, context_ideas)
+
+    cached_ideas = IDEA_CACHE.get(cache_key)
+    if cached_ideas is not None:
+        return cached_ideas
+
+    # aynı görsel ve bağlam için eşzamanlı istekler tek bir Gemini çağrısını paylaşır
+    return await IDEA_SINGLE_FLIGHT.do(cache_key, _generate_ideas_async, image, prompt, cache_key)
+
+async def _generate_ideas_async(image, prompt, cache_key):
     try:
-        response = CLIENT.models.generate_content(
-                    model='gemini-2.0-flash',
-                    contents=[
-                        types.Part.from_bytes(
-                            data=image,
-                            mime_type='image/jpeg',
-                        ),
-                        prompt
-                    ]
-                )
-        response_text = response.text
-        response_text = response_text.replace("`", "")
-        response_text = response_text.replace("json", "")
-
-        try:
-            upcycling_ideas = json.loads(response_text)
-            return upcycling_ideas
-        except json.JSONDecodeError:
-            print("Error: Gemini did not return valid JSON. Raw response:")
-            print(response.text)
-            return None
-            
+        with span("preprocess"):
+            image, mime_type = await IMAGE_PREPROCESSOR.process(image)
+        log_payload(logger, "Gemini idea prompt", prompt)
+        with span("gemini"):
+            response_text = await call_gemini(prompt, image, mime_type)
+        return _parse_ideas(response_text, cache_key)
+    except GeminiUnavailable as e:
+        logger.warning("Skipping Gemini call: %s", e)
+        return None
+    except asyncio.TimeoutError:
+        logger.error("Gemini call timed out", extra={"timeout_s": GEMINI_TIMEOUT})
+        return None
     except Exception as e:
-        print(f"Error processing image with Gemini: {e}")
-        return None
\ No newline at end of file
+        logger.error("Error processing image with Gemini: %s", e)
+        return None
+
+async def image_cache_key(image_path, context_ideas=None):
+    """Cache key (prompt version + sha256 + context hash) of an uploaded image, computed off the event loop."""
+    image, cache_key = await asyncio.to_thread(_load_image_with_key, image_path, context_ideas)
+    return cache_key
+
+def fallback_ideas(image_path):
+    """Ideas to serve when Gemini fails: a looser near-duplicate match, else the canned examples."""
+    similar_ideas = find_similar_ideas(image_path, max_distance=NEAR_DUPLICATE_DISTANCE * 2)
+    if similar_ideas is not None:
+        return similar_ideas
+    return FALLBACK_IDEAS
+
+async def generate_ideas(image_path, allow_fallback=GEMINI_FALLBACK, context_ideas=None):
+    """
+    Full idea generation flow shared by the endpoint and the background workers.
+
+    context_ideas (e.g. similar saved projects) are given to Gemini as examples.
+    """
+    if NEAR_DUPLICATE_MODE != "off":
+        # görsel dosyası ve indeks aynası okunabilir, event loop'u bloklamasın
+        similar_ideas = await asyncio.to_thread(find_similar_ideas, image_path)
+        if NEAR_DUPLICATE_MODE == "reuse" and similar_ideas is not None:
+            return similar_ideas
+        if similar_ideas is not None:
+            context_ideas = similar_ideas + (context_ideas or [])
+
+    ideas = await process_image_with_gemini_async(image_path, context_ideas=context_ideas)
+    if ideas is None and allow_fallback:
+        logger.warning("Gemini did not return ideas, serving fallback ideas")
+        return await asyncio.to_thread(fallback_ideas, image_path)
+    return ideas
+
+_STREAM_END = object()
+
+async def _stream_from_gemini(prompt, image, mime_type, out):
+    """
+    Feed the streamed Gemini response through JSONArrayStreamParser into out.
+
+    Runs as its own task so the GEMINI_GUARD slot is held only while Gemini
+    works, not while a slow client reads the ideas. _STREAM_END is always put
+    last; the task's exception (timeout, GeminiUnavailable, ...) is read by awaiting it.
+    """
+    parser = JSONArrayStreamParser()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GEMINI_TIMEOUT
+    try:
+        with span("gemini_stream"):
+            async with GEMINI_GUARD.attempt():
+                iterator = get_llm_provider().stream(prompt, image, mime_type).__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    for idea in validate_items(parser.feed(chunk), IdeaSchema):
+                        out.put_nowait(idea.model_dump())
+    finally:
+        out.put_nowait(_STREAM_END)
+
+async def stream_ideas(image_path):
+    """
+    Yield ideas one by one as soon as Gemini finishes each of them.
+
+    Cached and near-duplicate ideas are yielded right away. Otherwise the
+    streamed response is fed through JSONArrayStreamParser and the complete
+    list is cached once the stream ends. When Gemini fails or times out before
+    the first idea, the same fallback ideas as generate_ideas are streamed instead.
+    """
+    context_ideas = None
+    if NEAR_DUPLICATE_MODE != "off":
+        similar_ideas = await asyncio.to_thread(find_similar_ideas, image_path)
+        if NEAR_DUPLICATE_MODE == "reuse" and similar_ideas is not None:
+            for idea in similar_ideas:
+                yield idea
+            return
+        context_ideas = similar_ideas
+
+    prompt = create_system_prompt(context_ideas)
+    image, cache_key = await asyncio.to_thread(_load_image_with_key, image_path, context_ideas)
+
+    cached_ideas = IDEA_CACHE.get(cache_key)
+    if cached_ideas is not None:
+        for idea in cached_ideas:
+            yield idea
+        return
+
+    with span("preprocess"):
+        image, mime_type = await IMAGE_PREPROCESSOR.process(image)
+    out = asyncio.Queue()
+    producer = asyncio.ensure_future(_stream_from_gemini(prompt, image, mime_type, out))
+    ideas = []
+    try:
+        while (idea := await out.get()) is not _STREAM_END:
+            ideas.append(idea)
+            yield idea
+        await producer
+    except Exception as e:
+        # fikir gönderilmeye başlandıysa hata istemciye bildirilir
+        if ideas or not GEMINI_FALLBACK:
+            raise
+        if isinstance(e, GeminiUnavailable):
+            logger.warning("Skipping Gemini call, streaming fallback ideas: %s", e)
+        elif isinstance(e, asyncio.TimeoutError):
+            logger.error("Gemini stream timed out, streaming fallback ideas", extra={"timeout_s": GEMINI_TIMEOUT})
+        else:
+            logger.error("Error streaming ideas from Gemini, streaming fallback ideas: %s", e)
+        for idea in await asyncio.to_thread(fallback_ideas, image_path):
+            yield idea
+        return
+    finally:
+        # istemci bağlantıyı kapattıysa Gemini çağrısı da iptal edilir
+        if not producer.done():
+            producer.cancel()
+
+    if ideas:
+        IDEA_CACHE.set(cache_key, ideas)
+    elif GEMINI_FALLBACK:
+        logger.warning("Gemini did not stream any valid ideas, streaming fallback ideas")
+        for idea in await asyncio.to_thread(fallback_ideas, image_path):
+            yield idea
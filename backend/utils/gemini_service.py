@@ -1,75 +1,86 @@
 """Gemini API service for generating project roadmaps."""
-import json
-import base64
 import asyncio
+import hashlib
+import random
 from typing import List, Dict, Optional
-from utils.geminiConnection import get_gemini_model
-import google.generativeai as genai
+from utils.singleflight import SingleFlight
+from utils.llm_json import parse_roadmap_steps
+from utils.resilience import GeminiUnavailable
+from utils.geminiConnection import GEMINI_TIMEOUT, call_gemini
+from utils.image_preprocess import IMAGE_PREPROCESSOR
+from utils.logging_config import get_logger, log_payload, span
+
+logger = get_logger(__name__)
+
+ROADMAP_SINGLE_FLIGHT = SingleFlight("roadmap")
+
+# Gemini yanıt vermediğinde döndürülen basit yol haritası, veritabanına kaydedilmez
+FALLBACK_ROADMAP = [
+    {
+        "step_number": 1,
+        "title": "Plan Your Project",
+        "description": "Detailed roadmap could not be generated. Start by planning your approach.",
+        "estimated_time": "1 hour",
+        "materials_needed": ["paper", "pencil"]
+    },
+    {
+        "step_number": 2,
+        "title": "Gather Materials",
+        "description": "Collect all needed materials based on your plan.",
+        "estimated_time": "varies",
+        "materials_needed": []
+    }
+]
 
 class GeminiService:
-    def __init__(self):
-        self.model = get_gemini_model()
+    async def _call_gemini_with_retry(self, prompt: str, image_data: bytes, mime_type: str, max_retries: int = 3, delay: float = 1.0) -> Optional[str]:
+        """
+        Call Gemini through call_gemini (shared guard and GEMINI_TIMEOUT), retrying only while the breaker allows it.
 
-    async def _call_gemini_with_retry(self, prompt: str, image_part: Dict, max_retries: int = 3, delay: float = 1.0) -> Optional[str]:
-        """Call Gemini API with retry logic."""
+        image_data must already be preprocessed.
+        """
         for attempt in range(max_retries):
             try:
-                response = await self.model.generate_content(
-                    [prompt, image_part],
-                    generation_config={
+                response_text = await call_gemini(
+                    prompt,
+                    image_data,
+                    mime_type,
+                    config={
                         "temperature": 0.2,
                         "max_output_tokens": 4096
                     }
                 )
-                if response and response.text:
-                    return response.text.strip()
-                print(f"[WARN] Empty response from Gemini API on attempt {attempt + 1}")
+                if response_text:
+                    return response_text.strip()
+                logger.warning("Empty response from Gemini API", extra={"attempt": attempt + 1})
+            except GeminiUnavailable as e:
+                # devre açık ya da kota dolu, tekrar denemek yükü artırır
+                logger.warning("Gemini API unavailable, not retrying: %s", e)
+                return None
+            except asyncio.TimeoutError:
+                logger.error("Gemini API call timed out", extra={"attempt": attempt + 1, "timeout_s": GEMINI_TIMEOUT})
             except Exception as e:
-                print(f"[ERROR] Gemini API call failed on attempt {attempt + 1}: {str(e)}")
+                logger.error("Gemini API call failed: %s", e, extra={"attempt": attempt + 1})
             if attempt < max_retries - 1:
-                await asyncio.sleep(delay * (2 ** attempt))  # Exponential backoff
+                await asyncio.sleep(delay * (2 ** attempt) * random.uniform(0.5, 1.5))  # Exponential backoff with jitter
         return None
 
-    def _clean_json_text(self, text: str) -> str:
-        """Clean and prepare text for JSON parsing."""
-        # Remove markdown code blocks
-        if '```' in text:
-            parts = text.split('```')
-            if len(parts) > 1:
-                # Take the content between first ``` pair
-                text = parts[1].strip()
-                if text.startswith('json'):
-                    text = text[4:].strip()
-
-        # Basic cleanup
-        text = text.strip('`').strip()
-        text = text.replace('\'', '"')
-        text = text.replace('None', 'null')
-        text = text.replace('True', 'true')
-        text = text.replace('False', 'false')
-
-        # Ensure we have a JSON array
-        if '[' in text and ']' in text:
-            start = text.find('[')
-            end = text.rfind(']') + 1
-            text = text[start:end]
-
-        return text
-
-    async def generate_roadmap(self, image_data: bytes, project_name: str, description: str) -> List[Dict]:
-        """Generate a step-by-step roadmap for the upcycling project."""
-        print(f"[DEBUG] Starting roadmap generation for project: {project_name}")
-        
+    async def generate_roadmap(self, image_data: bytes, project_name: str, description: str, allow_fallback: bool = True) -> Optional[List[Dict]]:
+        """
+        Generate a step-by-step roadmap, sharing in-flight calls for the same project.
+
+        Returns FALLBACK_ROADMAP when Gemini fails, or None if allow_fallback is False.
+        """
+        key = hashlib.sha256(image_data + f"\x00{project_name}\x00{description}".encode("utf-8")).hexdigest()
+        steps = await ROADMAP_SINGLE_FLIGHT.do(key, self._generate_roadmap, image_data, project_name, description)
+        if steps is None and allow_fallback:
+            return FALLBACK_ROADMAP
+        return steps
+
+    async def _generate_roadmap(self, image_data: bytes, project_name: str, description: str) -> Optional[List[Dict]]:
+        """Generate a step-by-step roadmap for the upcycling project, None on failure."""
+
         try:
-            # Convert binary image to base64 for Gemini API
-            image_b64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Create the image part for the Gemini API
-            image_part = {
-                "mime_type": "image/jpeg",
-                "data": image_b64
-            }
-            
             prompt = f"""Analyze this image and create a step-by-step roadmap for the project: {project_name} - {description}.
 
 IMPORTANT: Your response must be ONLY a JSON array in the following format, with NO additional text or formatting:
@@ -124,118 +135,26 @@ Return ONLY the JSON array with NO additional text.
             Lütfen SADECE JSON dizisini döndür, başka hiçbir şey ekleme.
             """
 
-            print("[DEBUG] Generated prompt:")
-            print(prompt)
+            with span("preprocess"):
+                image_data, mime_type = await IMAGE_PREPROCESSOR.process(image_data)
+            log_payload(logger, "Gemini roadmap prompt", prompt)
+            with span("gemini"):
+                response_text = await self._call_gemini_with_retry(prompt, image_data, mime_type)
 
-            print("[DEBUG] Sending request to Gemini API...")
-            # Create the Gemini API request with the image and prompt
-            print("[DEBUG] Calling Gemini API with retry logic...")
-            response_text = await self._call_gemini_with_retry(prompt, image_part)
-            
             if not response_text:
-                print("[ERROR] Failed to get valid response from Gemini API after retries")
                 raise ValueError("Failed to get valid response from Gemini API")
-                
-            print("[DEBUG] Raw response from Gemini API:")
-            print("----------------------------------------")
-            print(response_text)
-            print("----------------------------------------")
-            
-            # Function to validate step format
-            def validate_step(step: Dict) -> Dict:
-                required_fields = {
-                    "step_number": int,
-                    "title": str,
-                    "description": str,
-                    "estimated_time": str,
-                    "materials_needed": list
-                }
-                
-                for field, field_type in required_fields.items():
-                    if field not in step:
-                        print(f"[ERROR] Missing required field: {field}")
-                        raise ValueError(f"Missing required field: {field}")
-                    if not isinstance(step[field], field_type):
-                        print(f"[ERROR] Invalid type for {field}: expected {field_type}, got {type(step[field])}")
-                        raise ValueError(f"Invalid type for {field}")
-                
-                # Ensure materials_needed contains only strings
-                if not all(isinstance(m, str) for m in step["materials_needed"]):
-                    print("[ERROR] materials_needed must contain only strings")
-                    raise ValueError("materials_needed must contain only strings")
-                    
-                return step
-            
-            try:
-                # Clean and parse the response
-                clean_text = self._clean_json_text(response_text)
-                print("[DEBUG] Cleaned response text:")
-                print(clean_text)
-                
-                # JSON parse etmeyi dene
-                try:
-                    steps = json.loads(clean_text)
-                except json.JSONDecodeError as je:
-                    print(f"[ERROR] JSON parse error: {str(je)}")
-                    # Alternatif temizleme dene
-                    if '[' in clean_text and ']' in clean_text:
-                        clean_text = clean_text[clean_text.find('['):clean_text.rfind(']')+1]
-                        steps = json.loads(clean_text)
-                    else:
-                        raise
-                
-                if not isinstance(steps, list):
-                    raise ValueError("Yanıt bir liste değil")
-                    
-                print("[DEBUG] Successfully parsed JSON response")
-                print(f"[DEBUG] Number of steps: {len(steps)}")
-                
-            except Exception as e:
-                print(f"[ERROR] Gemini yanıtı işlenemedi: {str(e)}")
-                print(f"[DEBUG] Ham yanıt: {response_text}")
-                # Basit bir yol haritası döndür
-                return [
-                    {
-                        "step_number": 1,
-                        "title": "Projeyi Planla",
-                        "description": "Detaylı yol haritası oluşturulamadı. Lütfen projenizi planlamaya başlayın.",
-                        "estimated_time": "1 saat",
-                        "materials_needed": ["kağıt", "kalem"]
-                    }
-                ]
-            
-            # Validate and clean up each step
-            print("[DEBUG] Validating and cleaning up steps...")
-            validated_steps = []
-            for i, step in enumerate(steps):
-                try:
-                    # Ensure step_number is correct
-                    step["step_number"] = i + 1
-                    validated_step = validate_step(step)
-                    validated_steps.append(validated_step)
-                except Exception as e:
-                    print(f"[ERROR] Invalid step format at index {i}: {str(e)}")
-                    raise ValueError(f"Invalid step format at index {i}: {str(e)}")
-            
-            print(f"[DEBUG] Successfully generated roadmap with {len(validated_steps)} steps")
+            log_payload(logger, "Gemini roadmap response", response_text)
+
+            # Parse and validate the response in one pass, invalid steps are dropped
+            with span("parse"):
+                validated_steps = parse_roadmap_steps(response_text)
+            if not validated_steps:
+                logger.error("Gemini yanıtı işlenemedi", extra={"response_chars": len(response_text)})
+                return None
+
+            logger.info("Generated roadmap", extra={"project_name": project_name, "steps": len(validated_steps)})
             return validated_steps
-            
+
         except Exception as e:
-            print(f"[ERROR] Failed to generate roadmap: {str(e)}")
-            # Return a simple fallback roadmap in case of error
-            return [
-                {
-                    "step_number": 1,
-                    "title": "Plan Your Project",
-                    "description": f"Error generating detailed roadmap: {str(e)}. Start by planning your approach.",
-                    "estimated_time": "1 hour",
-                    "materials_needed": ["paper", "pencil"]
-                },
-                {
-                    "step_number": 2,
-                    "title": "Gather Materials",
-                    "description": "Collect all needed materials based on your plan.",
-                    "estimated_time": "varies",
-                    "materials_needed": []
-                }
-            ]
+            logger.error("Failed to generate roadmap: %s", e)
+            return None
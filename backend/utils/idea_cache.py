@@ -0,0 +1,84 @@
+"""
+Content addressed cache for the upcycling ideas returned by Gemini.
+
+Ideas are keyed by the SHA-256 of the uploaded image bytes plus the prompt
+version, so re-uploading the exact same photo never reaches the model twice.
+
+- memory tier: LRU with TTL, always on
+- disk tier: SQLite file, enabled when IDEA_CACHE_PATH is set, survives restarts
+"""
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from utils.cache import LRUCache, SQLiteCache
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+IDEA_CACHE_SIZE = int(os.getenv("IDEA_CACHE_SIZE", "512"))
+IDEA_CACHE_TTL = float(os.getenv("IDEA_CACHE_TTL", str(7 * 24 * 3600)))
+IDEA_CACHE_PATH = os.getenv("IDEA_CACHE_PATH")
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """SHA-256 hex digest of the raw image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class IdeaCache:
+    def __init__(self, max_size: int, ttl: float, path: Optional[str] = None):
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk = SQLiteCache(path, ttl=ttl) if path else None
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def key_for(image_bytes: bytes, prompt_version: str) -> str:
+        return f"{prompt_version}:{image_digest(image_bytes)}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        ideas = self.memory.get(key)
+        if ideas is not None:
+            self._count("memory_hits")
+            return ideas
+
+        if self.disk is not None:
+            ideas = self.disk.get(key)
+            if ideas is not None:
+                self._count("disk_hits")
+                self.memory.set(key, ideas) # promote to memory tier
+                return ideas
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, ideas: Any) -> None:
+        self.memory.set(key, ideas)
+        if self.disk is not None:
+            self.disk.set(key, ideas)
+        self._count("stores")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_enabled": self.disk is not None,
+        }
+
+
+IDEA_CACHE = IdeaCache(max_size=IDEA_CACHE_SIZE, ttl=IDEA_CACHE_TTL, path=IDEA_CACHE_PATH)
@@ -0,0 +1,248 @@
+"""
+Perceptual hash index over uploaded images.
+
+Every image saved through save_image gets a 64-bit dHash. Hashes are kept in a
+multi-index Hamming structure so near-duplicate photos (same item, slightly
+different angle or lighting) can be found by Hamming distance without scanning every upload.
+Entries are mirrored to a SQLite file when IMAGE_INDEX_PATH is set so the index
+survives restarts and is shared by the API workers and the standalone job
+worker: each process picks up rows added by the others before a search. An
+image nobody has indexed yet (e.g. with no mirror configured, uploaded through
+another process) is hashed from its file on first lookup. Paths whose file was
+deleted are dropped when a search meets them.
+
+lookup and near_duplicates may read files and the mirror; call them off the
+event loop.
+"""
+import io
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from PIL import Image
+
+from utils.idea_cache import image_digest
+from utils.logging_config import get_logger
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+IMAGE_INDEX_PATH = os.getenv("IMAGE_INDEX_PATH")
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "6"))
+# reuse: benzer görselin fikirlerini direkt döndür, context: Gemini'ye örnek olarak ver, off: kapalı
+NEAR_DUPLICATE_MODE = os.getenv("NEAR_DUPLICATE_MODE", "reuse")
+
+HASH_SIZE = 8
+
+logger = get_logger(__name__)
+
+
+def dhash(image_bytes: bytes, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: compares neighbouring pixels of a tiny grayscale thumbnail."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # JPEG'i küçük ölçekte decode et, tam çözünürlüğe gerek yok
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over 64-bit hashes.
+
+    The hash is split into 4 blocks of 16 bits and every block has its own
+    exact-match table. Two hashes within distance r must agree on at least one
+    block up to r // 4 bits, so a query only probes the buckets around its own
+    blocks instead of walking the whole collection.
+    """
+
+    BLOCKS = 4
+    BLOCK_BITS = 16
+
+    def __init__(self):
+        self._tables = [{} for _ in range(self.BLOCKS)]
+        self._hashes: Dict[str, int] = {} # item -> hash
+        self._masks: Dict[int, List[int]] = {}
+
+    def _split(self, value: int) -> List[int]:
+        block_mask = (1 << self.BLOCK_BITS) - 1
+        return [(value >> (i * self.BLOCK_BITS)) & block_mask for i in range(self.BLOCKS)]
+
+    def _flip_masks(self, radius: int) -> List[int]:
+        """All block-sized masks with at most `radius` bits set."""
+        masks = self._masks.get(radius)
+        if masks is None:
+            masks = [m for m in range(1 << self.BLOCK_BITS) if m.bit_count() <= radius]
+            self._masks[radius] = masks
+        return masks
+
+    def add(self, value: int, item: str) -> None:
+        if item in self._hashes:
+            self.remove(item)
+        self._hashes[item] = value
+        for table, block in zip(self._tables, self._split(value)):
+            table.setdefault(block, set()).add(item)
+
+    def remove(self, item: str) -> bool:
+        value = self._hashes.pop(item, None)
+        if value is None:
+            return False
+        for table, block in zip(self._tables, self._split(value)):
+            bucket = table.get(block)
+            if bucket is not None:
+                bucket.discard(item)
+                if not bucket:
+                    del table[block]
+        return True
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, str]]:
+        candidates = set()
+        masks = self._flip_masks(radius // self.BLOCKS)
+        for table, block in zip(self._tables, self._split(value)):
+            for mask in masks:
+                bucket = table.get(block ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+
+        results = []
+        for item in candidates:
+            distance = hamming(value, self._hashes[item])
+            if distance <= radius:
+                results.append((distance, item))
+        results.sort()
+        return results
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+class ImageIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._hamming_index = MultiIndexHash()
+        self._entries: Dict[str, Tuple[int, str]] = {} # image path -> (phash, sha256 digest)
+        self._lock = threading.RLock()
+        self._conn = None
+        self._loaded = False
+        self._last_rowid = 0 # aynalanan son satır, diğer process'lerin eklediklerini okumak için
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS image_index ("
+                    " path TEXT PRIMARY KEY,"
+                    " phash TEXT NOT NULL,"
+                    " digest TEXT NOT NULL)"
+                )
+            self._loaded = True
+        self._sync()
+
+    def _sync(self) -> None:
+        """Read rows other processes added to the mirror since the last call."""
+        if self._conn is None:
+            return
+        with self._lock:
+            # INSERT OR REPLACE yeni bir rowid verir, güncellenen satırlar da okunur
+            for rowid, path, phash, digest in self._conn.execute(
+                "SELECT rowid, path, phash, digest FROM image_index WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)
+            ):
+                value = int(phash, 16)
+                self._entries[path] = (value, digest)
+                self._hamming_index.add(value, path)
+                self._last_rowid = rowid
+
+    def add(self, image_path: str, image_bytes: bytes, digest: Optional[str] = None) -> Optional[int]:
+        """Hash and index an uploaded image. Returns the hash, or None if Pillow cannot read it."""
+        try:
+            value = dhash(image_bytes)
+        except Exception as e:
+            logger.warning("Could not hash image %s: %s", image_path, e)
+            return None
+        if digest is None:
+            digest = image_digest(image_bytes)
+
+        self._ensure_loaded()
+        with self._lock:
+            self._entries[image_path] = (value, digest)
+            self._hamming_index.add(value, image_path)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO image_index (path, phash, digest) VALUES (?, ?, ?)",
+                    (image_path, f"{value:016x}", digest),
+                )
+        return value
+
+    def remove(self, image_path: str) -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.pop(image_path, None)
+            if entry is None:
+                return False
+            self._hamming_index.remove(image_path)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM image_index WHERE path = ?", (image_path,))
+        return True
+
+    def lookup(self, image_path: str) -> Optional[Tuple[int, str]]:
+        """(hash, digest) of an image, hashing its file if no process has indexed it yet."""
+        self._ensure_loaded()
+        entry = self._entries.get(image_path)
+        if entry is None:
+            try:
+                with open(image_path, "rb") as f:
+                    image_bytes = f.read()
+            except OSError:
+                return None
+            if self.add(image_path, image_bytes) is None:
+                return None
+            entry = self._entries.get(image_path)
+        return entry
+
+    def near_duplicates(self, image_path: str, max_distance: int = NEAR_DUPLICATE_DISTANCE) -> List[Tuple[int, str, str]]:
+        """(distance, path, digest) of indexed images close to image_path, nearest first."""
+        entry = self.lookup(image_path)
+        if entry is None:
+            return []
+        self._sync()
+        with self._lock:
+            matches = [
+                (distance, path, self._entries[path][1])
+                for distance, path in self._hamming_index.search(entry[0], max_distance)
+                if path != image_path and path in self._entries
+            ]
+        found = []
+        for distance, path, digest in matches:
+            if os.path.exists(path):
+                found.append((distance, path, digest))
+            else:
+                self.remove(path) # başka bir worker'da silinmiş
+        return found
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._entries)
+
+
+IMAGE_INDEX = ImageIndex(path=IMAGE_INDEX_PATH)
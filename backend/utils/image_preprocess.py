@@ -0,0 +1,147 @@
+"""
+Image preprocessing before uploads are sent to Gemini.
+
+Phone photos are often several megabytes, which mostly adds upload time to the
+model. Each image is decoded with its real format (not the file extension),
+rotated according to its EXIF orientation, downscaled so its longest edge is
+at most IMAGE_MAX_EDGE and re-encoded as JPEG at IMAGE_JPEG_QUALITY.
+The work runs in a process pool so it does not hold the GIL on request threads.
+"""
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+
+from utils.logging_config import get_logger
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+IMAGE_PREPROCESS = os.getenv("IMAGE_PREPROCESS", "true").lower() == "true"
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+EXIF_ORIENTATION = 0x0112
+
+logger = get_logger(__name__)
+
+
+def sniff_mime_type(image_bytes: bytes) -> Optional[str]:
+    """Real mime type from the file header, None if it is not an image Gemini accepts."""
+    if image_bytes.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def preprocess_image(image_bytes: bytes, max_edge: int = IMAGE_MAX_EDGE, quality: int = IMAGE_JPEG_QUALITY) -> Tuple[bytes, str, Dict[str, Any]]:
+    """
+    Returns (bytes, mime_type, stats). Runs in a worker process.
+
+    The original bytes are kept when re-encoding would not make them smaller,
+    e.g. an already small JPEG without EXIF rotation.
+    """
+    started = time.perf_counter()
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        source_format = image.format
+        # JPEG decoder'ı doğrudan küçük ölçekte açabilir
+        image.draft("RGB", (max_edge, max_edge))
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+        image = ImageOps.exif_transpose(image)
+        resized = max(image.size) > max_edge
+        if resized:
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            # şeffaf PNG'ler beyaz zemin üzerine alınır
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+            image = background
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        processed = output.getvalue()
+        size = image.size
+
+    if not rotated and not resized and source_format == "JPEG" and len(processed) >= len(image_bytes):
+        processed = image_bytes
+
+    stats = {
+        "source_format": source_format,
+        "original_bytes": len(image_bytes),
+        "processed_bytes": len(processed),
+        "width": size[0],
+        "height": size[1],
+        "seconds": time.perf_counter() - started,
+    }
+    return processed, "image/jpeg", stats
+
+
+class ImagePreprocessor:
+    def __init__(self, workers: int = IMAGE_PREPROCESS_WORKERS, enabled: bool = IMAGE_PREPROCESS):
+        self.workers = workers
+        self.enabled = enabled
+        self._executor = None
+        self._lock = threading.Lock()
+        self._counters = {"images": 0, "failures": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def process(self, image_bytes: bytes) -> Tuple[bytes, str]:
+        """Preprocess in the process pool. Falls back to the original bytes on any error."""
+        fallback_mime = sniff_mime_type(image_bytes) or "image/jpeg"
+        if not self.enabled:
+            return image_bytes, fallback_mime
+
+        loop = asyncio.get_running_loop()
+        try:
+            processed, mime_type, stats = await loop.run_in_executor(self._get_executor(), preprocess_image, image_bytes)
+        except Exception as e:
+            logger.warning("Image preprocessing failed, sending original image: %s", e)
+            with self._lock:
+                self._counters["failures"] += 1
+            return image_bytes, fallback_mime
+
+        with self._lock:
+            self._counters["images"] += 1
+            self._counters["bytes_in"] += stats["original_bytes"]
+            self._counters["bytes_out"] += stats["processed_bytes"]
+            self._counters["seconds"] += stats["seconds"]
+        return processed, mime_type
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        images = counters["images"]
+        return {
+            **counters,
+            "enabled": self.enabled,
+            "max_edge": IMAGE_MAX_EDGE,
+            "jpeg_quality": IMAGE_JPEG_QUALITY,
+            "bytes_saved": counters["bytes_in"] - counters["bytes_out"],
+            "avg_ms": round(counters["seconds"] / images * 1000, 2) if images else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+IMAGE_PREPROCESSOR = ImagePreprocessor()
@@ -0,0 +1,243 @@
+"""
+Job queue for background idea generation.
+
+The API enqueues a job and returns its id right away; workers (in-process
+asyncio tasks or `python -m services.idea_worker`) claim jobs, run them and
+store the result. Backends are pluggable through QUEUE_BACKENDS, the default
+is a SQLite file so no external broker is needed.
+
+Job lifecycle: queued -> running -> done | failed
+(running jobs go back to queued while attempts are left, also when a worker
+dies and its lease expires; every claim counts as an attempt)
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(backend_directory, "jobs.db"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_TTL = float(os.getenv("JOB_TTL", "3600")) # saniye, süresi dolan job'lar silinir
+JOB_LEASE = float(os.getenv("JOB_LEASE", "300")) # bu süreden uzun running kalan job tekrar kuyruğa alınır
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue(ABC):
+    """Interface every queue backend implements. Jobs are plain dicts."""
+
+    @abstractmethod
+    def enqueue(self, image_path: str, dedup_key: Optional[str] = None, context: Any = None, result: Any = None,
+                user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Queue a job for image_path on behalf of user_id. context (e.g. similar saved
+        projects) is handed to the worker; a job enqueued with a result is created
+        already done. Callers put the user in dedup_key, jobs are not shared between users.
+        """
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, result: Any) -> None:
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str, retry_delay: float = 0) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        ...
+
+
+class SQLiteJobQueue(JobQueue):
+    def __init__(self, path: str, max_attempts: int = JOB_MAX_ATTEMPTS, ttl: float = JOB_TTL, lease: float = JOB_LEASE):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.ttl = ttl
+        self.lease = lease
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # birden fazla process aynı dosyayı kullanabilir, kilitleri busy_timeout ile bekle
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id            TEXT PRIMARY KEY,
+                dedup_key     TEXT,
+                user_id       INTEGER,
+                image_path    TEXT NOT NULL,
+                context       TEXT,
+                status        TEXT NOT NULL,
+                result        TEXT,
+                error         TEXT,
+                attempts      INTEGER NOT NULL DEFAULT 0,
+                max_attempts  INTEGER NOT NULL,
+                worker_id     TEXT,
+                available_at  REAL NOT NULL,
+                created_at    REAL NOT NULL,
+                updated_at    REAL NOT NULL,
+                expires_at    REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_jobs_status_available ON jobs (status, available_at);
+            CREATE INDEX IF NOT EXISTS ix_jobs_dedup_key ON jobs (dedup_key);
+            """
+        )
+        # context ve user_id kolonları sonradan eklendi, eski kuyruk dosyaları için
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "context" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN context TEXT")
+        if "user_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN user_id INTEGER")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["context"] = json.loads(job["context"]) if job["context"] is not None else None
+        return job
+
+    @staticmethod
+    def _dumps(value: Any) -> Optional[str]:
+        return json.dumps(value, ensure_ascii=False) if value is not None else None
+
+    def enqueue(self, image_path: str, dedup_key: Optional[str] = None, context: Any = None, result: Any = None,
+                user_id: Optional[int] = None) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if dedup_key is not None:
+                    # aynı görsel için bekleyen, çalışan ya da biten job varsa onu döndür
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE dedup_key = ? AND status != ? AND expires_at > ?"
+                        " ORDER BY created_at DESC LIMIT 1",
+                        (dedup_key, FAILED, now),
+                    ).fetchone()
+                    if row is not None:
+                        self._conn.execute("COMMIT")
+                        return self._to_dict(row)
+
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, dedup_key, user_id, image_path, context, status, result, max_attempts,"
+                    " available_at, created_at, updated_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        job_id, dedup_key, user_id, image_path, self._dumps(context), QUEUED if result is None else DONE,
+                        self._dumps(result), self.max_attempts, now, now, now, now + self.ttl,
+                    ),
+                )
+                row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(row)
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # lease süresini aşan running job'lar çökmüş bir worker'a aittir,
+                # claim edilmeleri bir deneme sayılır, deneme hakkı bittiyse failed olur
+                self._conn.execute(
+                    "UPDATE jobs SET"
+                    " status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,"
+                    " error = ?, worker_id = NULL, available_at = ?, updated_at = ?"
+                    " WHERE status = ? AND updated_at < ?",
+                    (QUEUED, FAILED, "Worker lease expired", now, now, RUNNING, now - self.lease),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND available_at <= ? AND expires_at > ?"
+                    " ORDER BY available_at LIMIT 1",
+                    (QUEUED, now, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1, updated_at = ?"
+                    " WHERE id = ?",
+                    (RUNNING, worker_id, now, row["id"]),
+                )
+                job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(job)
+
+    def complete(self, job_id: str, result: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (DONE, self._dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str, retry_delay: float = 0) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET"
+                " status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,"
+                " available_at = ?, error = ?, worker_id = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (QUEUED, FAILED, now + retry_delay, error, now, job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+
+# yeni bir backend (örn. Redis) eklemek için buraya kaydetmek yeterli
+QUEUE_BACKENDS = {
+    "sqlite": lambda: SQLiteJobQueue(JOB_QUEUE_PATH),
+}
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                if JOB_QUEUE_BACKEND not in QUEUE_BACKENDS:
+                    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {JOB_QUEUE_BACKEND}")
+                _queue = QUEUE_BACKENDS[JOB_QUEUE_BACKEND]()
+    return _queue
@@ -0,0 +1,188 @@
+"""
+Helpers for reading JSON out of LLM responses.
+
+Every Gemini response goes through this module: the JSON array is located in a
+single scan, its elements are validated into the schemas below and whatever is
+still valid is kept when part of the response is broken.
+"""
+import ast
+import json
+import re
+from typing import Any, Callable, Dict, List, Type, TypeVar
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from utils.logging_config import get_logger
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+_DECODER = json.JSONDecoder()
+_ARRAY_START = re.compile(r"\[\s*[{\]]")
+_OPEN_BRACKET = re.compile(r"\[\s*")
+_SEPARATORS = re.compile(r"[\s,]*")
+
+logger = get_logger(__name__)
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON array of objects.
+
+    Text chunks are fed as they arrive from the model and every element object
+    is returned as soon as its closing brace is seen, without waiting for the
+    rest of the array. Anything before the opening '[' (markdown fences, prose,
+    bracketed references like "[3]") is skipped; the array starts at the first
+    '[' followed by '{' or ']'.
+    """
+
+    def __init__(self, element_loader: Callable[[str], Any] = json.loads, inside_array: bool = False):
+        self._load = element_loader
+        self._buffer = ""
+        self._pos = 0 # next character of _buffer to scan
+        self._depth = 1 if inside_array else 0 # 1 = inside the top-level array
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        objects = []
+        if self.finished:
+            return objects
+        self._buffer += chunk
+        buffer = self._buffer
+
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif char in "[{":
+                if self._depth == 0:
+                    # dizi yalnızca ardından '{' ya da ']' gelen '[' ile başlar,
+                    # önündeki metindeki "[3]" gibi ifadeler atlanır
+                    if char == "[":
+                        match = _ARRAY_START.match(buffer, i)
+                        if match is None and _OPEN_BRACKET.fullmatch(buffer, i):
+                            break # '[' sonrası henüz gelmedi, sonraki parçayı bekle
+                        if match is not None:
+                            self._depth = 1
+                else:
+                    self._depth += 1
+                    if self._depth == 2 and char == "{":
+                        self._object_start = i
+            elif char in "]}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 1 and char == "}" and self._object_start is not None:
+                    try:
+                        objects.append(self._load(buffer[self._object_start:i + 1]))
+                    except (ValueError, SyntaxError):
+                        pass # bozuk eleman atlanır
+                    self._object_start = None
+                elif self._depth == 0:
+                    self.finished = True
+                    break
+            i += 1
+
+        # tamamlanan elemanları buffer'dan at
+        keep_from = self._object_start if self._object_start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._object_start is not None:
+            self._object_start = 0
+        self._pos = i - keep_from
+        return objects
+
+
+class IdeaSchema(BaseModel):
+    """One upcycling idea as returned by create_system_prompt."""
+    title: str
+    description: str
+    materials: List[str] = Field(default_factory=list)
+    roadmap: List[str] = Field(default_factory=list)
+
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+
+class RoadmapStepSchema(BaseModel):
+    """One detailed roadmap step as returned by GeminiService.generate_roadmap."""
+    step_number: int
+    title: str
+    description: str
+    estimated_time: str
+    materials_needed: List[str] = Field(default_factory=list)
+
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+
+def _load_element(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # model bazen Python sözlüğü döndürüyor ('tek tırnak', None, True)
+        return ast.literal_eval(text)
+
+
+def extract_json_array(text: str) -> List[Any]:
+    """
+    Locate the JSON array in an LLM response and return its elements.
+
+    Markdown fences and prose around the array are ignored. When the array as a
+    whole is not valid JSON (truncated output, one broken element, trailing
+    comma) every element that still parses is salvaged.
+    """
+    # "[" ile başlayan ilk nesne dizisi; açıklama metnindeki [1] gibi ifadeler atlanır
+    match = _ARRAY_START.search(text)
+    if match is None:
+        return []
+    start = match.start()
+
+    try:
+        value, _ = _DECODER.raw_decode(text, start)
+        if isinstance(value, list):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    # elemanları tek tek decode et, ilk bozuk elemandan sonrasını karakter karakter tara
+    items = []
+    pos = start + 1
+    while True:
+        pos = _SEPARATORS.match(text, pos).end()
+        if pos >= len(text) or text[pos] == "]":
+            return items
+        try:
+            value, pos = _DECODER.raw_decode(text, pos)
+            items.append(value)
+        except json.JSONDecodeError:
+            parser = JSONArrayStreamParser(element_loader=_load_element, inside_array=True)
+            items.extend(parser.feed(text[pos:]))
+            return items
+
+
+def validate_items(items: List[Any], schema: Type[SchemaT]) -> List[SchemaT]:
+    """Validate elements against schema, dropping the ones that do not fit."""
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append(schema.model_validate(item))
+        except ValidationError as e:
+            logger.warning("Dropping invalid %s", schema.__name__, extra={"index": index, "errors": e.error_count()})
+    return valid
+
+
+def parse_ideas(text: str) -> List[Dict[str, Any]]:
+    return [idea.model_dump() for idea in validate_items(extract_json_array(text), IdeaSchema)]
+
+
+def parse_roadmap_steps(text: str) -> List[Dict[str, Any]]:
+    steps = validate_items(extract_json_array(text), RoadmapStepSchema)
+    # adım numaraları sıraya göre yeniden verilir
+    return [{**step.model_dump(), "step_number": i + 1} for i, step in enumerate(steps)]
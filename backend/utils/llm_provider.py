@@ -0,0 +1,196 @@
+"""
+LLM providers behind idea and roadmap generation.
+
+The provider is chosen with LLM_PROVIDER:
+
+- gemini (default): Google Gemini through the google-genai SDK. The SDK is
+  imported and the client is built on first use, so the app starts without
+  GEMINI_API_KEY and only fails when a call is actually made.
+- fake: deterministic local provider for load tests and offline development.
+  Returns recorded responses (FAKE_LLM_RESPONSES_DIR) after a simulated
+  latency and fails with the configured error rate.
+"""
+import asyncio
+import glob
+import hashlib
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+load_dotenv(current_directory + "/.env")
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
+
+FAKE_LLM_RESPONSES_DIR = os.getenv(
+    "FAKE_LLM_RESPONSES_DIR",
+    os.path.join(backend_directory, "benchmarks", "corpus", "llm_responses")
+)
+FAKE_LLM_LATENCY_MEDIAN = float(os.getenv("FAKE_LLM_LATENCY_MEDIAN", "2.0")) # saniye
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")) # lognormal sigma, kuyruk uzunluğu
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0.0"))
+FAKE_LLM_RATE_LIMIT_SHARE = float(os.getenv("FAKE_LLM_RATE_LIMIT_SHARE", "0.5")) # hataların ne kadarı 429
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "42"))
+
+
+class LLMProvider(ABC):
+    """Interface: a prompt plus one image in, response text out."""
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str, image: bytes, mime_type: str, config: Optional[Dict[str, Any]] = None) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, prompt: str, image: bytes, mime_type: str, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Async iterator over text chunks of the response."""
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    api_key = os.getenv("GEMINI_API_KEY")
+                    if not api_key:
+                        raise ValueError("GEMINI_API_KEY environment variable is not set")
+                    from google import genai
+                    self._client = genai.Client(api_key=api_key)
+        return self._client
+
+    def _contents(self, prompt: str, image: bytes, mime_type: str) -> List[Any]:
+        from google.genai import types
+        return [types.Part.from_bytes(data=image, mime_type=mime_type), prompt]
+
+    async def generate(self, prompt, image, mime_type, config=None):
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=self._contents(prompt, image, mime_type),
+            config=config
+        )
+        return response.text or ""
+
+    async def stream(self, prompt, image, mime_type, config=None):
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=self._contents(prompt, image, mime_type),
+            config=config
+        )
+        async for chunk in stream:
+            yield chunk.text or ""
+
+
+class FakeLLMError(Exception):
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline stand-in for Gemini.
+
+    The response is picked from the recorded corpus by hashing the prompt and
+    image, so the same input always gets the same answer. Latency follows a
+    lognormal distribution around FAKE_LLM_LATENCY_MEDIAN.
+    """
+
+    name = "fake"
+
+    def __init__(self,
+                 responses_dir: str = FAKE_LLM_RESPONSES_DIR,
+                 latency_median: float = FAKE_LLM_LATENCY_MEDIAN,
+                 latency_sigma: float = FAKE_LLM_LATENCY_SIGMA,
+                 error_rate: float = FAKE_LLM_ERROR_RATE,
+                 seed: int = FAKE_LLM_SEED):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._responses = {"ideas": [], "roadmap": []}
+        for path in sorted(glob.glob(os.path.join(responses_dir, "*.txt"))):
+            kind = "roadmap" if os.path.basename(path).startswith("roadmap") else "ideas"
+            with open(path, encoding="utf-8") as f:
+                self._responses[kind].append(f.read())
+        if not self._responses["ideas"]:
+            self._responses["ideas"].append(
+                '[{"title": "Fake idea", "description": "Synthetic response", '
+                '"materials": ["Tape"], "roadmap": ["Step 1", "Step 2"]}]'
+            )
+        if not self._responses["roadmap"]:
+            self._responses["roadmap"].append(
+                '[{"step_number": 1, "title": "Fake step", "description": "Synthetic response", '
+                '"estimated_time": "10 minutes", "materials_needed": []}]'
+            )
+
+    def _pick(self, prompt: str, image: bytes) -> str:
+        kind = "roadmap" if "step_number" in prompt else "ideas"
+        responses = self._responses[kind]
+        digest = hashlib.sha256(image + prompt.encode("utf-8")).digest()
+        return responses[int.from_bytes(digest[:4], "big") % len(responses)]
+
+    def _sample(self):
+        """(latency, error) for one call."""
+        latency = self._random.lognormvariate(0, self.latency_sigma) * self.latency_median
+        error = None
+        if self._random.random() < self.error_rate:
+            if self._random.random() < FAKE_LLM_RATE_LIMIT_SHARE:
+                error = FakeLLMError("429 RESOURCE_EXHAUSTED (fake)", 429)
+            else:
+                error = FakeLLMError("500 INTERNAL (fake)", 500)
+        return latency, error
+
+    async def generate(self, prompt, image, mime_type, config=None):
+        latency, error = self._sample()
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        return self._pick(prompt, image)
+
+    async def stream(self, prompt, image, mime_type, config=None):
+        latency, error = self._sample()
+        text = self._pick(prompt, image)
+        chunk_count = 8
+        chunk_size = max(1, len(text) // chunk_count + 1)
+        for start in range(0, len(text), chunk_size):
+            await asyncio.sleep(latency / chunk_count)
+            if error is not None:
+                raise error
+            yield text[start:start + chunk_size]
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_llm_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if LLM_PROVIDER not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER}")
+                _provider = PROVIDERS[LLM_PROVIDER]()
+    return _provider
@@ -0,0 +1,216 @@
+"""
+Logging setup shared by the API, the workers and the services.
+
+Records are put on an in-memory queue by a QueueHandler and written by a
+QueueListener thread, so request handlers never block on stdout. Every record
+carries the request id of the request that produced it.
+
+    logger = get_logger(__name__)
+
+    with span("gemini"):
+        response = await ...
+
+Spans are collected per request and logged with the request summary line.
+Large payloads (prompts, raw model responses) go through log_payload, which is
+sampled with LOG_PAYLOAD_SAMPLE_RATE and disabled by default.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json") # json | text
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+spans_var = contextvars.ContextVar("spans", default=None)
+
+_STANDARD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra= are kept as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {key: value for key, value in record.__dict__.items() if key not in _STANDARD_ATTRIBUTES}
+        if extra:
+            line += " " + json.dumps(extra, ensure_ascii=False, default=str)
+        return line
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Route all logging through a queue; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # request id, kaydı üreten task'ın context'inde okunmalı
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage of the current request; also works around awaits."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        spans = spans_var.get()
+        if spans is not None:
+            spans[stage] = round(spans.get(stage, 0) + elapsed_ms, 2)
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any) -> None:
+    """Debug-log a large payload for a sample of calls only."""
+    if LOG_PAYLOAD_SAMPLE_RATE <= 0 or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(label, extra={"payload": payload})
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware assigning a request id and logging one summary line per request.
+
+    A pure ASGI middleware (not BaseHTTPMiddleware) so streaming responses are
+    timed until their last chunk and context variables reach the endpoint.
+    The summary is logged when the last body chunk is sent; BackgroundTasks run
+    after that and are logged on their own line ("background finished") under
+    a "bg-<request id>" request id.
+    """
+
+    def __init__(self, app, span_path_prefixes=("/project",)):
+        self.app = app
+        self.span_path_prefixes = span_path_prefixes
+        self.logger = get_logger("request")
+
+    def _log(self, message: str, scope, started: float, spans: Dict[str, float], **fields) -> None:
+        fields.update(method=scope["method"], path=scope["path"], duration_ms=round((time.perf_counter() - started) * 1000, 2))
+        if scope["path"].startswith(self.span_path_prefixes):
+            fields["spans"] = spans
+        self.logger.info(message, extra=fields)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode())
+        request_id = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex
+        request_token = request_id_var.set(request_id)
+        spans: Dict[str, float] = {}
+        spans_token = spans_var.set(spans)
+        status_code = 500
+        started = time.perf_counter()
+        response_spans = None # yanıt bittiğindeki span'ler, sonrası arka plan işidir
+        response_finished = None
+
+        def finish_response():
+            nonlocal response_spans, response_finished
+            response_spans = dict(spans)
+            response_finished = time.perf_counter()
+            self._log("request finished", scope, started, response_spans, status=status_code)
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))
+                ]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and response_spans is None:
+                finish_response()
+                # arka plan görevleri kendi request id'siyle loglanır (streaming yanıtlarda
+                # son parça ayrı bir task'ta gönderildiği için bu yalnızca span'lere yansır)
+                request_id_var.set(f"bg-{request_id}")
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if response_spans is None:
+                finish_response() # hata ya da istemci bağlantıyı kapattı
+            else:
+                background_spans = {
+                    stage: round(elapsed - response_spans.get(stage, 0), 2)
+                    for stage, elapsed in spans.items() if elapsed != response_spans.get(stage)
+                }
+                if background_spans:
+                    request_id_var.set(f"bg-{request_id}")
+                    self._log("background finished", scope, response_finished, background_spans)
+            request_id_var.reset(request_token)
+            spans_var.reset(spans_token)
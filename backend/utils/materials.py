@@ -0,0 +1,275 @@
+"""
+Canonical materials and an inverted index from material to projects.
+
+Material names come from Gemini and from users in either language and in any
+shape ("2 adet Makas", "scissors", "Sıcak silikon"). canonical_material folds
+case and Turkish characters, drops counts and filler words and maps known
+Turkish/English synonyms to one key, so "makas" and "scissors" are both
+"makas". Unknown materials keep their lower-cased name as the key.
+
+MaterialIndex keeps one sorted project id array per material key plus the
+number of distinct materials each project needs. Projects that can be built
+from a set of materials are found by counting, with one np.unique over the
+posting arrays of that set, how many of each project's materials are covered;
+a project qualifies when all of them are. Facet counts are intersections of the
+same arrays. The index lives in memory in every worker; INDEX_SYNC in
+services/project_service.py loads it at startup and applies the projects
+changed by any worker before it is queried.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# canonical (Türkçe) -> eş anlamlılar; karşılaştırma harf katlanmış biçimlerle yapılır
+MATERIAL_SYNONYMS = {
+    "makas": ("scissors", "scissor"),
+    "yapıştırıcı": ("glue", "tutkal", "japon yapıştırıcı", "super glue", "adhesive"),
+    "sıcak silikon": ("hot glue", "silikon tabancası", "sıcak silikon tabancası", "hot glue gun", "glue gun", "silikon"),
+    "boya": ("paint", "akrilik boya", "acrylic paint", "sprey boya", "spray paint"),
+    "fırça": ("brush", "paintbrush", "boya fırçası", "paint brush"),
+    "ip": ("rope", "string", "sicim", "twine", "kınnap", "jüt ip", "jute"),
+    "iplik": ("thread", "yarn", "yün", "dikiş ipliği"),
+    "iğne": ("needle", "sewing needle", "dikiş iğnesi"),
+    "zımpara": ("sandpaper", "zımpara kağıdı"),
+    "matkap": ("drill", "power drill"),
+    "vida": ("screw", "screws"),
+    "çivi": ("nail", "nails"),
+    "çekiç": ("hammer",),
+    "tornavida": ("screwdriver",),
+    "testere": ("saw", "hand saw"),
+    "maket bıçağı": ("craft knife", "utility knife", "box cutter", "cutter"),
+    "cetvel": ("ruler",),
+    "kalem": ("pencil", "pen", "marker", "keçeli kalem"),
+    "bant": ("tape", "koli bandı", "duct tape", "masking tape", "kağıt bant", "selobant"),
+    "karton": ("cardboard", "mukavva", "karton kutu", "cardboard box"),
+    "kağıt": ("paper",),
+    "gazete": ("newspaper",),
+    "dergi": ("magazine",),
+    "kumaş": ("fabric", "cloth", "bez"),
+    "tişört": ("t-shirt", "tshirt", "t shirt", "shirt"),
+    "kot": ("denim", "jeans", "kot pantolon"),
+    "cam şişe": ("glass bottle", "şarap şişesi", "wine bottle"),
+    "plastik şişe": ("plastic bottle", "pet şişe", "pet bottle"),
+    "şişe": ("bottle",),
+    "kavanoz": ("jar", "cam kavanoz", "glass jar", "mason jar"),
+    "teneke kutu": ("tin can", "can", "teneke", "konserve kutusu", "metal can"),
+    "ahşap": ("wood", "tahta", "wooden board", "kereste"),
+    "palet": ("pallet", "ahşap palet", "wooden pallet"),
+    "tel": ("wire", "metal tel"),
+    "lastik": ("tire", "tyre", "araba lastiği", "car tire"),
+    "toprak": ("soil", "potting soil", "saksı toprağı"),
+    "tohum": ("seed", "seeds"),
+    "led ışık": ("led lights", "led light", "fairy lights", "led şerit", "string lights", "led"),
+    "pil": ("battery", "batteries"),
+    "dikiş makinesi": ("sewing machine",),
+    "eldiven": ("gloves", "glove"),
+    "vernik": ("varnish", "sealant", "cila"),
+    "düğme": ("button", "buttons"),
+    "boncuk": ("beads", "bead"),
+    "mandal": ("clothespin", "clothes peg"),
+    "mum": ("candle", "wax", "mum parafini"),
+    "fitil": ("wick", "candle wick"),
+}
+
+# sayılar ve miktar/sıfat gibi anahtarı değiştirmeyen kelimeler atılır
+FILLER_WORDS = frozenset((
+    "adet", "tane", "parça", "biraz", "bir", "iki", "kadar", "kullanılmış", "eski", "küçük", "büyük", "orta", "boy",
+    "a", "an", "the", "of", "some", "piece", "pieces", "pair", "used", "old", "small", "large", "big", "medium",
+))
+
+_FOLD = str.maketrans("ıişğüöçâîû", "iisguocaiu")
+_WORD = re.compile(r"[^\W\d_]+")
+MAX_PHRASE_WORDS = 4
+
+
+def _lower(value: str) -> str:
+    # Python'da "İ".lower() birleşik nokta bırakır; I/ı ayrımı fold ile zaten kaybolur
+    return value.replace("İ", "i").lower()
+
+
+def fold(value: str) -> str:
+    """Case- and diacritic-folded form used for matching ("ŞİŞE" -> "sise")."""
+    return _lower(value).translate(_FOLD)
+
+
+def _words(value: str) -> List[str]:
+    return [word for word in _WORD.findall(_lower(value)) if word not in FILLER_WORDS]
+
+
+_LOOKUP: Dict[str, str] = {}
+for _canonical, _synonyms in MATERIAL_SYNONYMS.items():
+    for _name in (_canonical,) + _synonyms:
+        _LOOKUP[" ".join(fold(word) for word in _words(_name))] = _canonical
+
+
+def _lookup(words: List[str]) -> Optional[str]:
+    folded = " ".join(fold(word) for word in words)
+    canonical = _LOOKUP.get(folded)
+    if canonical is None and folded.endswith("s"):
+        canonical = _LOOKUP.get(folded[:-1]) # İngilizce çoğul
+    if canonical is None:
+        stripped = re.sub(r"(lar|ler|lari|leri)$", "", folded) # Türkçe çoğul
+        if stripped != folded:
+            canonical = _LOOKUP.get(stripped)
+    return canonical
+
+
+def canonical_material(value: Any) -> Optional[str]:
+    """Canonical key of one material name, None when nothing is left after cleanup."""
+    words = _words(str(value or ""))
+    if not words:
+        return None
+    canonical = _lookup(words)
+    if canonical is not None:
+        return canonical
+    # "mavi akrilik boya" gibi: bilinen en uzun kelime grubu, önce sondan
+    for size in range(min(len(words) - 1, MAX_PHRASE_WORDS), 0, -1):
+        for start in range(len(words) - size, -1, -1):
+            canonical = _lookup(words[start:start + size])
+            if canonical is not None:
+                return canonical
+    return " ".join(words)
+
+
+def canonical_materials(values: Iterable[Any]) -> FrozenSet[str]:
+    return frozenset(key for key in (canonical_material(value) for value in values or ()) if key)
+
+
+class MaterialIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, set] = {}
+        self._arrays: Dict[str, np.ndarray] = {} # sıralı id dizileri, yazınca geçersiz olur
+        self._materials: Dict[int, FrozenSet[str]] = {}
+        self._totals = np.zeros(1024, dtype=np.int32) # proje id -> farklı malzeme sayısı
+        self._public = np.zeros(1024, dtype=bool)
+
+    def _ensure_capacity(self, project_id: int) -> None:
+        size = len(self._totals)
+        if project_id < size:
+            return
+        while size <= project_id:
+            size *= 2
+        totals, public = np.zeros(size, dtype=np.int32), np.zeros(size, dtype=bool)
+        totals[:len(self._totals)], public[:len(self._public)] = self._totals, self._public
+        self._totals, self._public = totals, public
+
+    def _remove_locked(self, project_id: int) -> None:
+        for key in self._materials.pop(project_id, ()):
+            postings = self._postings[key]
+            postings.discard(project_id)
+            self._arrays.pop(key, None)
+            if not postings:
+                del self._postings[key]
+        if project_id < len(self._totals):
+            self._totals[project_id] = 0
+            self._public[project_id] = False
+
+    def upsert(self, project_id: int, materials: Iterable[Any], is_public: bool) -> None:
+        keys = canonical_materials(materials)
+        with self._lock:
+            self._remove_locked(project_id)
+            self._ensure_capacity(project_id)
+            self._materials[project_id] = keys
+            for key in keys:
+                self._postings.setdefault(key, set()).add(project_id)
+                self._arrays.pop(key, None)
+            self._totals[project_id] = len(keys)
+            self._public[project_id] = bool(is_public)
+
+    def set_public(self, project_id: int, is_public: bool) -> bool:
+        with self._lock:
+            if project_id not in self._materials:
+                return False
+            self._public[project_id] = bool(is_public)
+        return True
+
+    def remove(self, project_id: int) -> bool:
+        with self._lock:
+            if project_id not in self._materials:
+                return False
+            self._remove_locked(project_id)
+        return True
+
+    def rebuild(self, projects: Iterable[Tuple[int, Any, bool]]) -> int:
+        """Replace the whole index with (project_id, materials, is_public) rows."""
+        with self._lock:
+            self._postings.clear()
+            self._arrays.clear()
+            self._materials.clear()
+            self._totals[:] = 0
+            self._public[:] = False
+        count = 0
+        for project_id, materials, is_public in projects:
+            self.upsert(project_id, materials, is_public)
+            count += 1
+        logger.info("Material index rebuilt", extra={"projects": count, "materials": len(self._postings)})
+        return count
+
+    def _array(self, key: str) -> np.ndarray:
+        array = self._arrays.get(key)
+        if array is None:
+            array = np.fromiter(sorted(self._postings.get(key, ())), dtype=np.int64)
+            self._arrays[key] = array
+        return array
+
+    def buildable(self, have: Iterable[Any], limit: int, before: Optional[int] = None, facet_limit: int = 10) -> Dict[str, Any]:
+        """
+        Public projects whose materials are all in have, newest (highest id) first.
+
+        Returns {"materials": canonical keys of have, "project_ids": one page,
+        "total": all matches, "facets": {"materials": matches per material of have,
+        "missing": materials that would unlock the most projects needing one more}}.
+        """
+        have_keys = sorted(canonical_materials(have))
+        result = {"materials": have_keys, "project_ids": [], "total": 0, "facets": {"materials": {}, "missing": {}}}
+        with self._lock:
+            arrays = [self._array(key) for key in have_keys if key in self._postings]
+            if not arrays:
+                return result
+            ids, covered = np.unique(np.concatenate(arrays), return_counts=True)
+            totals = self._totals[ids]
+            public = self._public[ids]
+            matched = ids[(covered == totals) & public][::-1]
+            near = ids[(covered == totals - 1) & public]
+
+            facets = {key: int(np.intersect1d(self._array(key), matched, assume_unique=True).size) for key in have_keys if key in self._postings}
+            have_set = set(have_keys)
+            missing = Counter(key for project_id in near.tolist() for key in self._materials[project_id] - have_set)
+
+        page = matched[matched < before] if before is not None else matched
+        result["project_ids"] = page[:limit].tolist()
+        result["total"] = int(matched.size)
+        result["facets"] = {
+            "materials": {key: count for key, count in facets.items() if count},
+            "missing": dict(missing.most_common(facet_limit)),
+        }
+        return result
+
+    def vocabulary(self, limit: int = 50) -> List[Tuple[str, int]]:
+        """Most used materials across public projects, for the "what do you have" form."""
+        with self._lock:
+            counts = [(key, int(self._public[self._array(key)].sum())) for key in self._postings]
+        return sorted((item for item in counts if item[1]), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def __len__(self) -> int:
+        return len(self._materials)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "projects": len(self._materials),
+                "public": int(self._public.sum()),
+                "materials": len(self._postings),
+                "postings": sum(len(postings) for postings in self._postings.values()),
+            }
+
+
+MATERIAL_INDEX = MaterialIndex()
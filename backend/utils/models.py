@@ -9,22 +9,111 @@ User
 
 Project
 - id: int
-- name: str
-- image: str
+- title: str
+- image: str (key under static/, "uploads/<file>")
 - description: str
+- materials: list[str]
+- roadmap: list[str]
 - user_id: int
-- created_at: datetime
-- updated_at: datetime
-- done: bool
+- created_at: datetime (UTC)
+- updated_at: datetime (UTC)
+- recycled_image: str (key under static/)
 - is_public: bool
+
+ProjectChange (written by database triggers, see migration 0006)
+- id: int
+- project_id: int
+
+CacheVersion (bumped by database triggers, see migration 0007)
+- name: str
+- version: int
+
+RoadmapStep
+- id: int
+- project_id: int
+- step_number: int
+- title: str
+- description: str
+- estimated_time: str
+- materials_needed: list[str]
 """
 
 from .database import Base
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from pydantic import BaseModel, ConfigDict
-from typing import List
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, Index, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
+from pydantic import BaseModel, ConfigDict, TypeAdapter, field_serializer
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, Optional
+import os
 import re
 
+# yüklenen görseller static/uploads altında, veritabanında static'e göre anahtar olarak tutulur
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "static")
+UPLOADS_DIR = os.path.join(STATIC_DIR, "uploads")
+
+
+class InvalidImageKey(ValueError):
+    pass
+
+
+def image_key(path: Optional[str]) -> Optional[str]:
+    """Key stored for an uploaded image: the path from "uploads" on ("/x/static/uploads/a.jpg" -> "uploads/a.jpg")."""
+    if not path:
+        return path
+    parts = path.replace("\\", "/").split("/") # cross-platform uyum
+    if "uploads" in parts:
+        return "/".join(parts[parts.index("uploads"):])
+    return path
+
+
+def image_file(key: str) -> str:
+    """
+    File system path of a stored image key.
+
+    Keys come from clients too (save-idea), so anything that does not resolve
+    to a file under static/uploads ("uploads/../../etc/passwd", symlinks out)
+    raises InvalidImageKey.
+    """
+    path = key if os.path.isabs(key) else os.path.join(STATIC_DIR, key)
+    uploads_dir = os.path.realpath(UPLOADS_DIR)
+    if os.path.commonpath([os.path.realpath(path), uploads_dir]) != uploads_dir:
+        raise InvalidImageKey(f"Image is not under static/uploads: {key!r}")
+    return path
+
+
+def utc_now() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    Timezone-aware UTC timestamp.
+
+    PostgreSQL stores it as timestamptz. SQLite has no timezone support, so the
+    value is stored as naive UTC and the offset is attached again when read.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc) # naive değerler UTC kabul edilir
+        value = value.astimezone(timezone.utc)
+        if dialect.name == "sqlite":
+            return value.replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+
 class User(Base):
     __tablename__ = 'users'
 
@@ -42,13 +131,57 @@ class Project(Base):
     user_id         = Column(Integer, ForeignKey('users.id'))
     title           = Column(String) # project name
     description     = Column(String) # project short description
-    materials       = Column(String) # project materials
-    roadmap         = Column(String) # project steps
+    materials       = Column(JSON, default=list) # project materials
+    roadmap         = Column(JSON, default=list) # project steps
     image           = Column(String) # recyclable item image
-    created_at      = Column(String)
+    created_at      = Column(UTCDateTime, nullable=False, default=utc_now)
+    updated_at      = Column(UTCDateTime, nullable=False, default=utc_now, onupdate=utc_now)
     recycled_image  = Column(String, default=None) # recycled item image
     is_public       = Column(Boolean, default=False)
 
+    # detaylı yol haritası, ilk görüntülemede ya da kayıttan sonra arka planda üretilir
+    roadmap_steps   = relationship("RoadmapStep", cascade="all, delete-orphan", order_by="RoadmapStep.step_number")
+
+    # my-ideas (user_id) ve explore (is_public) listeleri en yeniden eskiye, sıralama index'ten okunur
+    __table_args__ = (
+        Index("ix_project_user_created", "user_id", "created_at"),
+        Index("ix_project_public_created", "is_public", "created_at"),
+    )
+
+
+class ProjectChange(Base):
+    __tablename__ = 'project_change'
+    # satırları project tablosundaki trigger'lar yazar, worker'lar bellek içi indekslerini bununla günceller
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id              = Column(Integer, primary_key=True)
+    project_id      = Column(Integer, nullable=False)
+
+
+class CacheVersion(Base):
+    __tablename__ = 'cache_version'
+    # "explore" satırı public proje kümesi her değiştiğinde trigger'la artar
+
+    name            = Column(String, primary_key=True)
+    version         = Column(Integer, nullable=False, default=0)
+
+
+class RoadmapStep(Base):
+    __tablename__ = 'roadmap_step'
+
+    id               = Column(Integer, primary_key=True, index=True)
+    project_id       = Column(Integer, ForeignKey('project.id', ondelete="CASCADE"), nullable=False)
+    step_number      = Column(Integer, nullable=False)
+    title            = Column(String)
+    description      = Column(String)
+    estimated_time   = Column(String)
+    materials_needed = Column(JSON, default=list)
+
+    # bir projenin adımları tek index taramasıyla sıralı okunur, aynı adım iki kez yazılamaz
+    __table_args__ = (
+        Index("ix_roadmap_step_project_step", "project_id", "step_number", unique=True),
+    )
+
 
 class ProjectSchema(BaseModel):
     id: int
@@ -56,44 +189,27 @@ class ProjectSchema(BaseModel):
     image: str
     title: str
     description: str
-    materials: str
-    roadmap: str
-    created_at: str
+    materials: List[str]
+    roadmap: List[str]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
     recycled_image: str | None
     is_public: bool
 
     model_config = ConfigDict(from_attributes=True)
 
-    @staticmethod
-    def _decode_field(value: str) -> List[str]:
-        list_ = value.split("-")
-        list_ = [item.replace("{", "") for item in list_]
-        list_ = [item.replace("}", "") for item in list_]
-        return list_
-
-    def model_dump(self, *args, **kwargs):
-        data = super().model_dump(*args, **kwargs)
-        data["materials"] = self._decode_field(self.materials)
-        data["roadmap"] = self._decode_field(self.roadmap)
-
-        if self.image:
-            parts = self.image.replace("\\", "/").split("/")  # cross-platform uyum
-            if "uploads" in parts:
-                uploads_index = parts.index("uploads")
-                relative_path = "/".join(parts[uploads_index:])
-                data["image"] = relative_path
-            else:
-                data["image"] = self.image  
-
-        if self.recycled_image:
-            parts = self.recycled_image.replace("\\", "/").split("/")  # cross-platform uyum
-            if "uploads" in parts:
-                uploads_index = parts.index("uploads")
-                relative_path = "/".join(parts[uploads_index:])
-                data["recycled_image"] = relative_path
-            else:
-                data["recycled_image"] = self.recycled_image  
-
-        return data
+    # JSON'da ISO 8601 string; Python modunda datetime kalır, orjson aynı biçimde yazar
+    @field_serializer("created_at", "updated_at", when_used="json")
+    def serialize_timestamp(self, value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
+
+
+# liste yanıtları tek TypeAdapter çağrısıyla (pydantic-core içinde) doğrulanıp dict'e çevrilir
+PROJECT_LIST = TypeAdapter(List[ProjectSchema])
+
+
+def dump_projects(projects: Iterable[Any]) -> List[dict]:
+    """Project rows (ORM objects or result rows) as dicts for ORJSONResponse."""
+    return PROJECT_LIST.dump_python(PROJECT_LIST.validate_python(list(projects), from_attributes=True))
 
 
@@ -0,0 +1,87 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row on a page, (created_at, id) for the
+project feeds, (score, id) for search results and the id alone for the
+materials filter, encoded as url-safe base64 JSON. The next page starts right
+after that key, so it is a single index range scan no matter how deep the
+client has paged.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "20"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "100"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode(*key) -> str:
+    payload = json.dumps(key, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str, size: int = 2) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != size:
+        raise InvalidCursor("Invalid cursor")
+    return key
+
+
+def encode_cursor(created_at: datetime, project_id: int) -> str:
+    return _encode(created_at.isoformat(), project_id)
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    created_at, project_id = _decode(cursor)
+    try:
+        return datetime.fromisoformat(created_at), int(project_id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def encode_score_cursor(score: float, project_id: int) -> str:
+    return _encode(score, project_id)
+
+
+def decode_score_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    if not cursor:
+        return None
+    score, project_id = _decode(cursor)
+    try:
+        return float(score), int(project_id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def encode_id_cursor(project_id: int) -> str:
+    return _encode(project_id)
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    project_id, = _decode(cursor, size=1)
+    try:
+        return int(project_id)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
@@ -0,0 +1,227 @@
+"""
+Retrieval index over saved projects (title, description, materials).
+
+Each project is a hashed term-frequency vector (unigrams and bigrams hashed into
+PROJECT_INDEX_DIM signed buckets, sublinear tf). Scores are cosine similarities
+between idf-weighted vectors. Adding or removing a project is a single row
+write: the row's idf-weighted norm is computed with the current IDF snapshot,
+and the snapshot (and every norm) is recomputed only once the corpus has
+changed by PROJECT_INDEX_IDF_REFRESH since it was taken. A query only reads the
+columns of its own non-zero buckets.
+
+The index lives in the memory of each worker (capacity x dim float32, about
+8 KB per project at the default dim). The database is its only writer:
+main.py loads it at startup and services.project_service.INDEX_SYNC applies
+the project_change log before it is queried, so every worker converges on the
+same rows.
+"""
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from utils.logging_config import get_logger
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+PROJECT_INDEX_DIM = int(os.getenv("PROJECT_INDEX_DIM", "2048")) # 2'nin kuvveti olmalı
+# proje sayısı bu oranda değişince idf ve normlar yeniden hesaplanır
+PROJECT_INDEX_IDF_REFRESH = float(os.getenv("PROJECT_INDEX_IDF_REFRESH", "0.1"))
+
+INITIAL_CAPACITY = 1024
+NORM_CHUNK_ROWS = 4096 # normlar bu kadar satırlık parçalarla hesaplanır, tüm matrisin kopyası alınmaz
+_TOKEN = re.compile(r"\w+")
+
+logger = get_logger(__name__)
+
+
+def tokenize(text: str) -> List[str]:
+    words = [word for word in _TOKEN.findall(text.lower()) if len(word) > 1 and not word.isdigit()]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def vectorize(text: str, dim: int = PROJECT_INDEX_DIM) -> np.ndarray:
+    """Signed hashed sublinear term frequencies; crc32 keeps buckets stable across processes."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for term, count in Counter(tokenize(text)).items():
+        h = zlib.crc32(term.encode("utf-8"))
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        vector[h & (dim - 1)] += sign * (1.0 + math.log(count))
+    return vector
+
+
+def project_text(title: Optional[str], description: Optional[str], materials: Any) -> str:
+    if isinstance(materials, (list, tuple)):
+        materials = " ".join(str(item) for item in materials)
+    return " ".join(part for part in (title, description, materials) if part)
+
+
+class ProjectIndex:
+    def __init__(self, dim: int = PROJECT_INDEX_DIM, idf_refresh: float = PROJECT_INDEX_IDF_REFRESH):
+        if dim & (dim - 1):
+            raise ValueError("PROJECT_INDEX_DIM must be a power of two")
+        self.dim = dim
+        self.idf_refresh = idf_refresh
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self._ids = np.zeros(INITIAL_CAPACITY, dtype=np.int64) # 0 = boş satır
+        self._public = np.zeros(INITIAL_CAPACITY, dtype=np.uint8)
+        self._norms = np.zeros(INITIAL_CAPACITY, dtype=np.float32) # ||v * idf||, _idf ile
+        self._rows: Dict[int, int] = {} # project id -> row
+        self._free: List[int] = list(range(INITIAL_CAPACITY - 1, -1, -1)) # pop() küçük satırdan başlasın
+        self._df = np.zeros(dim, dtype=np.int64)
+        self._idf = np.ones(dim, dtype=np.float32)
+        self._changes_since_idf = 0
+
+    # --- storage ---
+
+    def _grow(self) -> None:
+        capacity = len(self._ids)
+        self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+        self._ids = np.concatenate([self._ids, np.zeros_like(self._ids)])
+        self._public = np.concatenate([self._public, np.zeros_like(self._public)])
+        self._norms = np.concatenate([self._norms, np.zeros_like(self._norms)])
+        self._free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def _refresh_idf_locked(self) -> None:
+        documents = len(self._rows)
+        self._idf = (np.log((1 + documents) / (1 + self._df)) + 1).astype(np.float32)
+        idf_squared = np.square(self._idf)
+        for start in range(0, len(self._ids), NORM_CHUNK_ROWS):
+            chunk = self._vectors[start:start + NORM_CHUNK_ROWS]
+            self._norms[start:start + NORM_CHUNK_ROWS] = np.sqrt(np.square(chunk) @ idf_squared)
+        self._changes_since_idf = 0
+
+    def _changed_locked(self) -> None:
+        self._changes_since_idf += 1
+        if self._changes_since_idf > max(1, len(self._rows)) * self.idf_refresh:
+            self._refresh_idf_locked()
+
+    # --- updates ---
+
+    def _clear_row(self, row: int) -> None:
+        self._df -= self._vectors[row] != 0
+        self._vectors[row] = 0
+        self._ids[row] = 0
+        self._public[row] = 0
+        self._norms[row] = 0
+
+    def _write_locked(self, project_id: int, vector: np.ndarray, is_public: bool) -> None:
+        row = self._rows.get(project_id)
+        if row is not None:
+            self._clear_row(row)
+        else:
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            self._rows[project_id] = row
+        self._vectors[row] = vector
+        self._ids[row] = project_id
+        self._public[row] = 1 if is_public else 0
+        self._norms[row] = np.linalg.norm(vector * self._idf)
+        self._df += vector != 0
+
+    def upsert(self, project_id: int, text: str, is_public: bool) -> None:
+        vector = vectorize(text, self.dim)
+        with self._lock:
+            self._write_locked(project_id, vector, is_public)
+            self._changed_locked()
+
+    def set_public(self, project_id: int, is_public: bool) -> bool:
+        with self._lock:
+            row = self._rows.get(project_id)
+            if row is None:
+                return False
+            self._public[row] = 1 if is_public else 0
+        return True
+
+    def remove(self, project_id: int) -> bool:
+        with self._lock:
+            row = self._rows.pop(project_id, None)
+            if row is None:
+                return False
+            self._clear_row(row)
+            self._free.append(row)
+            self._changed_locked()
+        return True
+
+    def rebuild(self, projects: Iterable[Tuple[int, str, bool]]) -> int:
+        """Replace the whole index with (project_id, text, is_public) rows."""
+        with self._lock:
+            for row in list(self._rows.values()):
+                self._clear_row(row)
+            self._rows.clear()
+            self._free = list(range(len(self._ids) - 1, -1, -1))
+            self._df[:] = 0
+        count = 0
+        for project_id, text, is_public in projects:
+            vector = vectorize(text, self.dim)
+            with self._lock:
+                self._write_locked(project_id, vector, is_public)
+            count += 1
+        with self._lock:
+            self._refresh_idf_locked() # normlar en sonda bir kez
+        logger.info("Project index rebuilt", extra={"projects": count})
+        return count
+
+    # --- queries ---
+
+    def search(self, query: str, k: int = 5, public_only: bool = True, exclude: Iterable[int] = ()) -> List[Tuple[float, int]]:
+        """
+        (cosine score, project id) of the k most similar projects, best first.
+
+        CPU bound (one pass over the matching columns), async callers run it in a thread.
+        """
+        query_vector = vectorize(query, self.dim)
+        buckets = np.flatnonzero(query_vector)
+        if buckets.size == 0:
+            return []
+        with self._lock:
+            if not self._rows:
+                return []
+            idf = self._idf[buckets]
+            # sorgunun sıfır olmayan kovaları dışındaki sütunlar skora katkı vermez
+            scores = self._vectors[:, buckets] @ (query_vector[buckets] * np.square(idf))
+            query_norm = float(np.linalg.norm(query_vector[buckets] * idf))
+            norms = self._norms
+            scores = np.divide(scores, norms * query_norm, out=np.zeros_like(scores), where=norms > 0)
+            mask = self._ids != 0
+            if public_only:
+                mask &= self._public == 1
+            for project_id in exclude:
+                row = self._rows.get(project_id)
+                if row is not None:
+                    mask[row] = False
+            scores[~mask] = -1
+            top = min(k, int(mask.sum()))
+            if top == 0:
+                return []
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(float(scores[row]), int(self._ids[row])) for row in best if scores[row] > 0]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "projects": len(self._rows),
+                "public": int(self._public.sum()),
+                "capacity": len(self._ids),
+                "dim": self.dim,
+                "memory_bytes": int(self._vectors.nbytes + self._ids.nbytes + self._public.nbytes + self._norms.nbytes),
+                "changes_since_idf": self._changes_since_idf,
+            }
+
+
+PROJECT_INDEX = ProjectIndex()
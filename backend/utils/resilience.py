@@ -0,0 +1,220 @@
+"""
+Resilience layer shared by every Gemini entry point.
+
+- TokenBucket: keeps us under the request quota (GEMINI_RATE_LIMIT per second)
+- AIMDLimiter: adaptive concurrency limit, grows by one slot per window of
+  healthy calls and halves on 429s, timeouts or slow responses
+- CircuitBreaker: after GEMINI_BREAKER_FAILURES consecutive failures every call
+  fails immediately for GEMINI_BREAKER_RESET seconds, then one probe is allowed
+
+    async with GEMINI_GUARD.attempt():
+        response = await client.aio.models.generate_content(...)
+
+Callers catch GeminiUnavailable to serve a fallback instead of waiting.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+current_directory = os.path.dirname(os.path.abspath(__file__)) # utils directory
+backend_directory = os.path.dirname(current_directory) # backend directory
+
+load_dotenv(backend_directory + "/.env")
+
+GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "10")) # istek / saniye
+GEMINI_RATE_BURST = int(os.getenv("GEMINI_RATE_BURST", "20"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+GEMINI_MIN_CONCURRENCY = int(os.getenv("GEMINI_MIN_CONCURRENCY", "2"))
+GEMINI_SLOW_CALL = float(os.getenv("GEMINI_SLOW_CALL", "20")) # saniye, bundan yavaş çağrılar limiti düşürür
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "10")) # slot/token için en fazla bekleme
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+
+
+class GeminiUnavailable(Exception):
+    """Raised instead of calling Gemini when the breaker is open or we are over quota."""
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """429 / RESOURCE_EXHAUSTED / 503 from the SDK, or our own timeout."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code in (429, 503):
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "UNAVAILABLE" in message
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    raise GeminiUnavailable("Gemini rate limit reached")
+                await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {"rate": self.rate, "burst": self.burst, "tokens": round(self._tokens, 2)}
+
+
+class AIMDLimiter:
+    def __init__(self, initial: int, minimum: int, maximum: int, slow_call: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_call = slow_call
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, timeout: float) -> None:
+        async with self._condition:
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.in_flight < int(self.limit)),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                raise GeminiUnavailable("Gemini concurrency limit reached")
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if overloaded or latency > self.slow_call:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                # limit kadar başarılı çağrıda bir slot artar
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "min": self.minimum, "max": self.maximum}
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise GeminiUnavailable("Gemini circuit breaker is open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # yarı açık durumda tek bir deneme isteğine izin verilir
+            if self._probe_in_flight:
+                raise GeminiUnavailable("Gemini circuit breaker is half open")
+            self._probe_in_flight = True
+
+    def cancel_probe(self) -> None:
+        """The call never reached Gemini, let another request probe."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class GeminiGuard:
+    def __init__(self):
+        self.bucket = TokenBucket(GEMINI_RATE_LIMIT, GEMINI_RATE_BURST)
+        self.limiter = AIMDLimiter(
+            initial=GEMINI_MAX_CONCURRENCY,
+            minimum=GEMINI_MIN_CONCURRENCY,
+            maximum=GEMINI_MAX_CONCURRENCY,
+            slow_call=GEMINI_SLOW_CALL
+        )
+        self.breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET)
+        self._counters = {"calls": 0, "successes": 0, "failures": 0, "overloaded": 0, "rejected": 0}
+
+    @asynccontextmanager
+    async def attempt(self):
+        """Run the body as one guarded Gemini call; its exception decides the outcome."""
+        self._counters["calls"] += 1
+        try:
+            self.breaker.before_call()
+        except GeminiUnavailable:
+            self._counters["rejected"] += 1
+            raise
+        try:
+            await self.bucket.acquire(GEMINI_QUEUE_TIMEOUT)
+            await self.limiter.acquire(GEMINI_QUEUE_TIMEOUT)
+        except BaseException:
+            self._counters["rejected"] += 1
+            self.breaker.cancel_probe()
+            raise
+
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_overload_error(e)
+            self._counters["failures"] += 1
+            self._counters["overloaded"] += overloaded
+            self.breaker.record_failure()
+            await self.limiter.release(time.monotonic() - started, overloaded=overloaded)
+            raise
+        except BaseException:
+            # iptal ya da istemcinin stream'i kapatması Gemini'nin durumu hakkında bilgi vermez
+            self.breaker.cancel_probe()
+            await self.limiter.release(time.monotonic() - started, overloaded=False)
+            raise
+        else:
+            self._counters["successes"] += 1
+            self.breaker.record_success()
+            await self.limiter.release(time.monotonic() - started, overloaded=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "breaker": self.breaker.stats(),
+            "concurrency": self.limiter.stats(),
+            "rate_limit": self.bucket.stats(),
+        }
+
+
+GEMINI_GUARD = GeminiGuard()
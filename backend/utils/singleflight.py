@@ -0,0 +1,44 @@
+"""
+Single-flight request coalescing for expensive async calls.
+
+Concurrent callers asking for the same key share one in-flight task instead
+of each starting their own Gemini call. The task is forgotten as soon as it
+finishes, so a failure is propagated to everyone who was waiting on it but
+the next call with that key starts fresh.
+Coalescing is per event loop, i.e. per uvicorn worker.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+# metrics endpoint'i için isim -> SingleFlight
+SINGLE_FLIGHTS: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._counters = {"calls": 0, "executions": 0, "coalesced": 0, "failures": 0}
+        SINGLE_FLIGHTS[name] = self
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._counters["failures"] += 1
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        self._counters["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._counters["executions"] += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self._counters["coalesced"] += 1
+        # bir çağıranın iptal edilmesi diğer bekleyenleri etkilemesin
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "in_flight": len(self._inflight)}